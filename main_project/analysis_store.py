@@ -0,0 +1,203 @@
+from main_project.paths import data_path
+from main_project.strategy import Evaluator
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+
+DEFAULT_STORE_PATH = data_path("analysis.sqlite")
+
+# Grids are stored once for every set of rules, position and depth. A grid and its mirror image share a row.
+SCHEMA = """CREATE TABLE IF NOT EXISTS analysis (
+    num_rows INTEGER NOT NULL,
+    num_columns INTEGER NOT NULL,
+    win_num INTEGER NOT NULL,
+    key BLOB NOT NULL,
+    depth INTEGER NOT NULL,
+    move_values TEXT NOT NULL,
+    solved INTEGER NOT NULL,
+    PRIMARY KEY (num_rows, num_columns, win_num, key, depth)
+)"""
+
+_open_stores: dict = {}  # Stores which have already been opened by this process, with the path as the key
+
+
+class AnalysisStore:
+    def __init__(self, path=DEFAULT_STORE_PATH, batch_size=64):
+        """
+        A database of analysed grids which is kept between runs. Results are written by a background thread in
+        batches, so saving a result never waits for the disk.
+        Parameters
+        ----------
+        path: str
+            The path of the database file, which is made if it doesn't exist.
+        batch_size: int
+            The most results written in one transaction.
+
+        """
+        self.path = path
+        self.batch_size = batch_size
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(SCHEMA)
+        self._connection.commit()
+        self._lock = threading.Lock()  # The connection is shared by the writer thread
+
+        # Results which have been saved but not written yet, so they can still be looked up
+        self._pending: dict = {}
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_batches, daemon=True)
+        self._writer.start()
+
+    @staticmethod
+    def row_key(evaluator: Evaluator, depth: int):
+        """
+        Finds the primary key of the evaluator's grid.
+        Parameters
+        ----------
+        evaluator: Evaluator
+            The evaluator whose position and mask are looked up.
+        depth: int
+            The depth of the search.
+
+        Returns
+        -------
+        tuple[tuple, bool]
+            The rules, key and depth of the grid, and whether the key is for its mirror image.
+
+        """
+        key, mirrored = evaluator.cache_key(evaluator.get_mask(), evaluator.get_position())
+        key_bytes = key.to_bytes((key.bit_length() + 7) // 8, "big")
+        return (evaluator.num_rows, evaluator.num_columns, evaluator.win_num, key_bytes, depth), mirrored
+
+    def lookup(self, evaluator: Evaluator, depth: int):
+        """
+        Finds the analysis of the evaluator's grid. A deeper search, or one which reached the end of the game, is
+        used if there isn't one at the depth.
+        Parameters
+        ----------
+        evaluator: Evaluator
+            The evaluator whose position and mask are looked up.
+        depth: int
+            The depth of the search.
+
+        Returns
+        -------
+        tuple[list, bool] | None
+            The value of each move and whether the values are exact, or None if the grid hasn't been analysed.
+
+        """
+        row_key, mirrored = self.row_key(evaluator, depth)
+        with self._lock:
+            result = self._pending.get(row_key)
+            if result is None:
+                row = self._connection.execute(
+                    "SELECT move_values, solved FROM analysis WHERE num_rows = ? AND num_columns = ? AND win_num = ? "
+                    "AND key = ? AND (depth >= ? OR solved) ORDER BY depth LIMIT 1", row_key).fetchone()
+                if row is None:
+                    return None
+
+                result = [None if value is None else tuple(value) for value in json.loads(row[0])], bool(row[1])
+
+        move_values, solved = result
+        # The moves are stored for the grid with the smaller key, so we might need to mirror them
+        return (move_values[::-1] if mirrored else list(move_values)), solved
+
+    def save(self, evaluator: Evaluator, depth: int, result=None):
+        """
+        Saves the move values of the evaluator's grid. They are written to the database in the background.
+        Parameters
+        ----------
+        evaluator: Evaluator
+            The evaluator whose position and mask were analysed.
+        depth: int
+            The depth of the search.
+        result: tuple[list, bool] | None
+            The value of each move and whether the values are exact, defaults to the evaluator's move values.
+
+        """
+        if result is None:
+            result = evaluator.move_values, evaluator.solved
+
+        row_key, mirrored = self.row_key(evaluator, depth)
+        move_values, solved = result
+        with self._lock:
+            self._pending[row_key] = (move_values[::-1] if mirrored else list(move_values)), solved
+
+        self._queue.put(row_key)
+
+    def _write_batches(self):
+        # Runs in the writer thread, waiting for results and writing everything that has been saved in one go
+        while True:
+            row_keys = [self._queue.get()]
+            while len(row_keys) < self.batch_size and not self._queue.empty():
+                row_keys.append(self._queue.get())
+
+            rows = []
+            with self._lock:
+                for row_key in row_keys:
+                    if row_key is not None and row_key in self._pending:
+                        move_values, solved = self._pending[row_key]
+                        rows.append(row_key + (json.dumps(move_values), solved))
+
+                self._connection.executemany("INSERT OR REPLACE INTO analysis VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                self._connection.commit()
+                for row_key in row_keys:
+                    self._pending.pop(row_key, None)
+
+            for _ in row_keys:
+                self._queue.task_done()
+
+            if None in row_keys:
+                return  # The store is being closed
+
+    def flush(self):
+        """
+        Waits until every saved result has been written.
+
+        """
+        self._queue.join()
+
+    def close(self):
+        """
+        Writes the remaining results and closes the database.
+
+        """
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+            self._connection.close()
+
+        _open_stores.pop(self.path, None)
+
+    def __len__(self):
+        self.flush()
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+
+    def __repr__(self):
+        return f"AnalysisStore({self.path=})"
+
+
+def open_store(path=DEFAULT_STORE_PATH):
+    """
+    Gets the analysis store at the path, opening it if this process hasn't already.
+    Parameters
+    ----------
+    path: str
+        The path of the database file.
+
+    Returns
+    -------
+    AnalysisStore
+        The analysis store.
+
+    """
+    if path not in _open_stores:
+        _open_stores[path] = AnalysisStore(path)
+        # The results still waiting to be written are written before the program exits
+        atexit.register(_open_stores[path].close)
+
+    return _open_stores[path]
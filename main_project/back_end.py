@@ -1,10 +1,14 @@
 from main_project.connect4_grid import Grid
 import copy
 from main_project.strategy import Strategy, Evaluator
+from main_project.opening_book import load_book
+from main_project.profiling import profile_move
+import uuid
 
 
 class Game:
-    def __init__(self, interface, num_rows=6, num_columns=7, win_num=4):
+    def __init__(self, interface, num_rows=6, num_columns=7, win_num=4, grid_class=Grid, checkpoint_interval=None,
+                 analysis_store=None):
         """
         Parameters
         ----------
@@ -16,13 +20,19 @@ class Game:
             The number of columns in the grid.
         win_num: int
             The number of symbols in a row needed to win.
+        grid_class: type
+            The grid to play on, either Grid or the smaller CompactGrid.
+        checkpoint_interval: int | None
+            How many turns apart copies of the grid are kept in the history, or None to only keep the moves.
+        analysis_store: AnalysisStore | None
+            The store to check before analysing a turn and to save the analysis in.
 
         """
         self.interface = interface
         self.num_rows = num_rows
         self.num_columns = num_columns
 
-        self.grid = Grid(num_rows, num_columns, win_num)
+        self.grid = grid_class(num_rows, num_columns, win_num)
 
         self.symbols: list = ['R', 'B', 'G', 'X']  # The default symbols to use if invalid symbols are given by the
         # Interface
@@ -32,11 +42,13 @@ class Game:
         self.current_player_num: int = 0  # The index of the player whose turn it is
         self.current_player = None
         self.turn_num: int = 1  # Start at 1 since it is the state after the move has been made
-        self.past_states: dict = {0: [copy.deepcopy(self.grid), None,
-                                      None]}  # A dictionary of past game states with the turn num as the index
-        # {turn_num: [grid, move_made_row, move_made_column]}
+        # The past game states, which are rebuilt from the moves when they are looked at
+        # past_states[turn_num] is (grid, move_made_column, move_made_row)
         # Turn 0 is an empty grid
         # Turn 1 is after p1 has made a move
+        self.past_states = GameHistory(self.grid, checkpoint_interval)
+        self.analysis_store = analysis_store
+        self.game_id = uuid.uuid4().hex[:12]  # Identifies the game in profiles of its moves
 
     def add_human_player(self, name: str, symbol=""):
         """
@@ -51,7 +63,7 @@ class Game:
         """
         self.players.append(Player(self, name, symbol))
 
-    def add_computer_player(self, name: str, difficulty: int, symbol=""):
+    def add_computer_player(self, name: str, difficulty: int, symbol="", time_limit=None, strategy_settings=None):
         """
         Adds a computer player to the list of players.
         Parameters
@@ -62,29 +74,35 @@ class Game:
             The difficulty of the player.
         symbol: str
             The symbol of the player.
+        time_limit: float | None
+            The number of seconds the computer can spend on each move.
+        strategy_settings: dict | None
+            Keyword arguments for the player's Strategy, which replace the ones chosen by the difficulty.
 
         """
-        self.players.append(ComputerPlayer(self, name, difficulty, symbol))
+        self.players.append(ComputerPlayer(self, name, difficulty, symbol, time_limit, strategy_settings))
 
     def make_player_move(self):
         """
-        Gets a valid move from the player and then makes that move in the grid.
+        Gets a valid move from the player and then makes that move in the grid. The move is profiled if profiling is
+        on.
 
         """
-        move_made = False
-        while not move_made:
-            try:
-                # If an index error is raised that means that it is an invalid move (likely because the column is full)
-                # so we ask the player to make it again
-                move = self.current_player.get_move()
-                self.grid.add_piece(move, self.current_player.symbol)
-                move_made = True
-                self.add_to_past_dict(move)
-
-                return move
-
-            except IndexError as error:
-                self.current_player.register_error(error)
+        with profile_move(self.game_id, self.turn_num, self.current_player.name):
+            move_made = False
+            while not move_made:
+                try:
+                    # If an index error is raised that means that it is an invalid move (likely because the column is
+                    # full) so we ask the player to make it again
+                    move = self.current_player.get_move()
+                    self.grid.add_piece(move, self.current_player.symbol)
+                    move_made = True
+                    self.add_to_past_dict(move)
+
+                    return move
+
+                except IndexError as error:
+                    self.current_player.register_error(error)
 
     def play_game(self):
         """
@@ -96,12 +114,14 @@ class Game:
         while not self.game_over:
             move = self.make_player_move()  # Want to send the CLI the move
 
-            self.interface.display_grid(highlighted_moves=[(self.grid.column_height(move) - 1, move)])
+            row = self.grid.column_height(move) - 1
+            self.interface.display_grid(highlighted_moves=[(row, move)])
             self.interface.display_move(move)
 
             self.turn_num += 1
 
-            if self.grid.check_win():
+            # Only the lines through the piece that was just added need checking
+            if self.grid.check_win_from(row, move):
                 self.game_over = True
                 self.interface.display_win(self.current_player)
 
@@ -115,19 +135,45 @@ class Game:
 
     def add_to_past_dict(self, move_made):
         """
-        Adds the current grid and the move to the past dictionary.
+        Adds the move to the history of the game.
         Parameters
         ----------
         move_made: int
             The move that the current player has just made.
 
         """
-        if move_made is None:
-            self.past_states[self.turn_num] = copy.deepcopy(self.grid), None, None
+        self.past_states.add_move(move_made, self.current_player.symbol, self.grid)
 
-        else:
-            self.past_states[self.turn_num] = copy.deepcopy(self.grid), move_made, self.grid.column_height(
-                move_made) - 1
+    def analyse_turn(self, turn: int, depth=11):
+        """
+        Evaluates the grid at the given turn, returning the evaluators value and length for each move that could have
+        been made.
+        Parameters
+        ----------
+        turn: int
+            The turn to check.
+        depth: int
+            The depth at which the evaluator will check.
+
+        Returns
+        -------
+        tuple[list, bool]
+            The evaluators values and lengths for all the possible moves and whether they are exact.
+
+        """
+        # If it is turn 5 and red has just made a move then it will evaluate the possible moves for blue.
+        evaluator = Evaluator(self.past_states.grid_at(turn), self.players[turn % len(self.players)].symbol, depth)
+        evaluator.grid_to_int()
+        if self.analysis_store is not None:
+            result = self.analysis_store.lookup(evaluator, depth)
+            if result is not None:
+                return result
+
+        evaluator.calculate_move_values()
+        if self.analysis_store is not None:
+            self.analysis_store.save(evaluator, depth)
+
+        return evaluator.move_values, evaluator.solved
 
     def evaluate_move(self, turn: int, depth=11):
         """
@@ -146,12 +192,104 @@ class Game:
 
         """
         # This will look at the dictionary of moves and evaluate the move made on a scale of -10 to 10
-        # If it is turn 5 and red has just made a move then it will evaluate the possible moves for blue.
-        evaluator = Evaluator(self.past_states[turn][0], self.players[turn % len(self.players)].symbol, depth)
-        evaluator.grid_to_int()
-        evaluator.calculate_move_values()
+        move_values, _ = self.analyse_turn(turn, depth)
         # Need to check if it is a none value.
-        return [element if element is None else element[0] for element in evaluator.move_values]
+        return [element if element is None else element[0] for element in move_values]
+
+
+class GameHistory:
+    def __init__(self, grid, checkpoint_interval=None):
+        """
+        The history of a game, stored as the moves made. The grid at any turn is rebuilt by replaying the moves.
+        Parameters
+        ----------
+        grid: Grid | CompactGrid
+            The grid at the start of the game.
+        checkpoint_interval: int | None
+            How many turns apart copies of the grid are kept, so fewer moves have to be replayed. If None only the
+            starting grid is kept.
+
+        """
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoints: dict = {0: copy.deepcopy(grid)}  # Copies of the grid with the turn num as the key
+        self.moves: list = []  # The column of the move made each turn
+        self.symbols: list = []  # The symbol of the player who made each move
+
+    def add_move(self, move: int, symbol: str, grid=None):
+        """
+        Adds a move to the history.
+        Parameters
+        ----------
+        move: int
+            The column of the move.
+        symbol: str
+            The symbol of the player who made the move.
+        grid: Grid | CompactGrid | None
+            The grid after the move, which is copied if a checkpoint is due.
+
+        """
+        self.moves.append(move)
+        self.symbols.append(symbol)
+        turn = len(self.moves)
+        if grid is not None and self.checkpoint_interval and turn % self.checkpoint_interval == 0:
+            self.checkpoints[turn] = copy.deepcopy(grid)
+
+    def grid_at(self, turn: int):
+        """
+        Rebuilds the grid after a turn from the nearest checkpoint before it.
+        Parameters
+        ----------
+        turn: int
+            The turn to rebuild.
+
+        Returns
+        -------
+        Grid | CompactGrid
+            A new grid, which can be changed without changing the history.
+
+        Raises
+        ------
+        IndexError
+            If the turn hasn't happened.
+
+        """
+        if not 0 <= turn <= len(self.moves):
+            raise IndexError("Turn is not in the history.")
+
+        start = max(checkpoint for checkpoint in self.checkpoints if checkpoint <= turn)
+        grid = copy.deepcopy(self.checkpoints[start])
+        for index in range(start, turn):
+            grid.add_piece(self.moves[index], self.symbols[index])
+
+        return grid
+
+    def __getitem__(self, turn: int):
+        """
+        Gets a past game state in the same form the states used to be stored in.
+        Parameters
+        ----------
+        turn: int
+            The turn to get.
+
+        Returns
+        -------
+        tuple
+            The grid after the turn, the column of the move made and the row it landed in. The move and row are None
+            for turn 0.
+
+        """
+        grid = self.grid_at(turn)
+        if turn == 0:
+            return grid, None, None
+
+        move = self.moves[turn - 1]
+        return grid, move, grid.column_height(move) - 1
+
+    def __len__(self):
+        return len(self.moves) + 1
+
+    def __repr__(self):
+        return f"GameHistory({len(self.moves)=}, {self.checkpoint_interval=})"
 
 
 class Player:
@@ -205,7 +343,7 @@ class ComputerPlayer(Player):
                        4: (10, 1.0),
                        5: (1, 1.0)} #5 is used for testing as it has no randomness but does not take time to test
 
-    def __init__(self, game: Game, name: str, difficulty: int, symbol=""):
+    def __init__(self, game: Game, name: str, difficulty: int, symbol="", time_limit=None, strategy_settings=None):
         """
         Initializes the computer player.
         Parameters
@@ -218,13 +356,27 @@ class ComputerPlayer(Player):
             The difficulty of the computer.
         symbol: str
             The symbol of the player.
+        time_limit: float | None
+            The number of seconds the computer can spend on each move. If given, the depth of the difficulty is the
+            deepest the computer will search.
+        strategy_settings: dict | None
+            Keyword arguments for the Strategy, such as depth, select_p, book, workers or options. They replace the
+            settings chosen by the difficulty. If no book is given the default book is used when the depth is at
+            least the depth the book was searched to.
 
         """
 
         super().__init__(game, name, symbol)
         self.difficulty = difficulty
         difficulty_tuple = ComputerPlayer.difficulty_dict[difficulty]
-        self.strategy = Strategy(game.grid, self.symbol, difficulty_tuple[0], difficulty_tuple[1])
+        settings = {"depth": difficulty_tuple[0], "select_p": difficulty_tuple[1], "time_limit": time_limit,
+                    **(strategy_settings or {})}
+        if "book" not in settings:
+            # The book's moves are as strong as a search to the book's depth, so weaker players search instead
+            book = load_book()
+            settings["book"] = book if book is not None and settings["depth"] >= book.depth else None
+
+        self.strategy = Strategy(game.grid, self.symbol, **settings)
 
     def get_move(self):
         """
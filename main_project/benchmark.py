@@ -0,0 +1,468 @@
+# Benchmarks for the computer player. Run this file directly to print the results.
+from main_project.connect4_grid import Grid, CompactGrid
+from main_project.strategy import Evaluator, shutdown_pools
+from collections import defaultdict
+import copy
+import math
+import os
+import random
+import sys
+import time
+
+
+class LegacyDictCache:
+    def __init__(self, evaluator: Evaluator):
+        """
+        The old cache, which was a dictionary keyed by (mask, position) tuples with a (value, depth) tuple for each
+        position. Looking up a position that wasn't stored added an empty (None, None) entry. It can be used by an
+        evaluator in place of a transposition table, so its memory can be measured after a real search. The old cache
+        had no bounds, so they are kept in a separate dictionary which isn't counted.
+        Parameters
+        ----------
+        evaluator: Evaluator
+            The evaluator whose keys are unpacked into masks and positions.
+
+        """
+        self.evaluator = evaluator
+        self.positions = defaultdict(lambda: (None, None))
+        self.bounds = {}
+        self.generation = 0
+
+    def probe(self, key):
+        value, depth = self.positions[self.evaluator.unpack_key(key)]
+        if value is None:
+            return None
+
+        return key, value, depth, self.bounds[key], None, self.generation
+
+    def store(self, key, value, depth: int, bound: int, move=None):
+        self.positions[self.evaluator.unpack_key(key)] = (value, depth)
+        self.bounds[key] = bound
+
+    def new_generation(self):
+        self.generation += 1
+
+    def memory_usage(self):
+        """
+        Returns
+        -------
+        int
+            The number of bytes used by the dictionary and everything in it.
+
+        """
+        return deep_size(self.positions)
+
+    def __len__(self):
+        return sum(1 for value, _ in self.positions.values() if value is not None)
+
+
+def benchmark_cache_memory(depth=10, cache_size=None):
+    """
+    Searches the empty 7x6 grid with the old and new caches and measures the memory each uses.
+    Parameters
+    ----------
+    depth: int
+        The depth to search to.
+    cache_size: int | None
+        The number of slots in the transposition table. If None the evaluator chooses it from the depth.
+
+    Returns
+    -------
+    dict
+        The seconds taken, the number of positions stored, the number of entries including empty ones, the total bytes
+        and the bytes per stored position of each cache, with "legacy" or "table" as the key.
+
+    """
+    results = {}
+    for name in ("legacy", "table"):
+        evaluator = Evaluator(Grid(), "R", depth, cache_size)
+        if name == "legacy":
+            evaluator.cache = LegacyDictCache(evaluator)
+
+        evaluator.grid_to_int()
+        start = time.perf_counter()
+        evaluator.calculate_move_values()
+        elapsed = time.perf_counter() - start
+        stored = len(evaluator.cache)
+        total = evaluator.cache.memory_usage()
+        results[name] = {"seconds": elapsed, "stored": stored,
+                         "entries": len(evaluator.cache.positions) if name == "legacy" else stored,
+                         "bytes": total, "bytes_per_position": total / stored}
+
+    return results
+
+
+def benchmark_move_ordering(depths=(8, 10, 12)):
+    """
+    Counts the nodes searched from the empty 7x6 grid with all the move ordering, none of it, and each part of it
+    turned off.
+    Parameters
+    ----------
+    depths: tuple[int]
+        The depths to search to.
+
+    Returns
+    -------
+    dict
+        The number of nodes and seconds taken for each setting and depth.
+
+    """
+    settings = {"all": {},
+                "none": {"center_ordering": False, "killer_moves": False, "history_heuristic": False},
+                "no center": {"center_ordering": False},
+                "no killers": {"killer_moves": False},
+                "no history": {"history_heuristic": False}}
+    results = {}
+    for name, options in settings.items():
+        for depth in depths:
+            evaluator = Evaluator(Grid(), "R", depth, **options)
+            evaluator.grid_to_int()
+            start = time.perf_counter()
+            evaluator.calculate_move_values()
+            results[(name, depth)] = (evaluator.stats.nodes, time.perf_counter() - start)
+
+    return results
+
+
+def evaluate_cell_by_cell(evaluator: Evaluator, position: int):
+    """
+    Evaluates a grid by checking the bit of every cell, which is how the heuristic used to be calculated.
+    Parameters
+    ----------
+    evaluator: Evaluator
+        The evaluator of the grid.
+    position: int
+        The position of the grid to evaluate.
+
+    Returns
+    -------
+    int:
+        the estimate for the value of the grid
+
+    """
+    weights = evaluator.calculate_weights()
+    total = 0
+    for column in range(evaluator.num_columns):
+        for row in range(evaluator.num_rows):
+            total += weights[row][column] * evaluator.check_bit(position, column, row)
+
+    return total
+
+
+def random_grids(number: int, seed=0):
+    """
+    Makes random 7x6 grids by playing random moves.
+    Parameters
+    ----------
+    number: int
+        The number of grids to make.
+    seed: int
+        The seed of the random moves.
+
+    Returns
+    -------
+    list[tuple[int, int]]
+        The mask and position of each grid.
+
+    """
+    generator = random.Random(seed)
+    evaluator = Evaluator(Grid(), "R", 0, cache_size=1)
+    grids = []
+    for _ in range(number):
+        mask, position = 0, 0
+        for _ in range(generator.randint(0, 30)):
+            columns = [column for column in range(evaluator.num_columns) if not evaluator.check_bit(mask, column, 0)]
+            mask, position, _ = evaluator.make_move(mask, position, generator.choice(columns))
+
+        grids.append((mask, position))
+
+    return grids
+
+
+def benchmark_leaf_evaluation(number=100000):
+    """
+    Measures how many leaves per second the heuristic can evaluate, using the weight planes and checking each cell.
+    Parameters
+    ----------
+    number: int
+        The number of leaves to evaluate.
+
+    Returns
+    -------
+    dict
+        The number of leaves per second for each way of evaluating them.
+
+    """
+    evaluator = Evaluator(Grid(), "R", 0, cache_size=1)
+    grids = random_grids(1000)
+    leaves = [grids[index % len(grids)] for index in range(number)]
+
+    start = time.perf_counter()
+    for mask, position in leaves:
+        evaluate_cell_by_cell(evaluator, position) - evaluate_cell_by_cell(evaluator, position ^ mask)
+    cell_by_cell = number / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for mask, position in leaves:
+        evaluator.evaluate_difference(mask, position)
+    planes = number / (time.perf_counter() - start)
+
+    return {"cell by cell leaves per second": cell_by_cell, "weight planes leaves per second": planes}
+
+
+def check_four_in_a_row_fixed(evaluator: Evaluator, position: int):
+    """
+    Checks for a 4-in-a-row with the shifts written out for n = 4, which is how it used to be checked.
+    Parameters
+    ----------
+    evaluator: Evaluator
+        The evaluator of the grid.
+    position: int
+        The position to check.
+
+    Returns
+    -------
+    bool
+        Whether the position contains a 4-in-a-row.
+
+    """
+    num_rows = evaluator.num_rows
+    base_shift = position >> num_rows + 1
+    shift = position & base_shift
+    if shift & (shift >> (num_rows * 2 + 2)):
+        return True
+
+    shift = position & (base_shift << 1)
+    if shift & (shift >> (num_rows * 2)):
+        return True
+
+    shift = position & (base_shift >> 1)
+    if shift & (shift >> ((num_rows * 2) + 4)):
+        return True
+
+    shift = position & (position >> 1)
+    if shift & (shift >> 2):
+        return True
+
+    return False
+
+
+def benchmark_win_detection(number=100000):
+    """
+    Measures how many positions per second can be checked for a 4-in-a-row on the 7x6 grid, using the general
+    shift doubling check and the old check written out for n = 4.
+    Parameters
+    ----------
+    number: int
+        The number of positions to check.
+
+    Returns
+    -------
+    dict
+        The number of positions checked per second by each check.
+
+    """
+    evaluator = Evaluator(Grid(), "R", 0, cache_size=1)
+    grids = random_grids(1000)
+    positions = [grids[index % len(grids)][1] for index in range(number)]
+
+    # The timings are noisy so the fastest of a few repeats is used
+    fixed = []
+    general = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for position in positions:
+            check_four_in_a_row_fixed(evaluator, position)
+        fixed.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for position in positions:
+            evaluator.check_n_in_a_row(position)
+        general.append(time.perf_counter() - start)
+
+    return {"fixed n = 4 checks per second": number / min(fixed),
+            "shift doubling checks per second": number / min(general)}
+
+
+def benchmark_cache_reuse(depth=10, moves=8):
+    """
+    Plays the first moves of a game on the 7x6 grid, choosing the best move each time, and measures how long each
+    move takes with a new evaluator and with one evaluator kept for the whole game. Both search with iterative
+    deepening, so the kept evaluator can use its cache from the earlier moves.
+    Parameters
+    ----------
+    depth: int
+        The depth to search to.
+    moves: int
+        The number of moves to play.
+
+    Returns
+    -------
+    list[tuple[float, float]]
+        The number of seconds taken by the new and the kept evaluator for each move.
+
+    """
+    grid = Grid()
+    kept = Evaluator(grid, "R", depth)
+    symbols = ["R", "B"]
+    results = []
+    for turn in range(moves):
+        cold = Evaluator(grid, symbols[turn % 2], depth)
+        cold.grid_to_int()
+        start = time.perf_counter()
+        values = cold.iterative_deepening(math.inf)
+        cold_time = time.perf_counter() - start
+
+        kept.player_symbol = symbols[turn % 2]
+        kept.grid_to_int()
+        start = time.perf_counter()
+        kept.iterative_deepening(math.inf)
+        results.append((cold_time, time.perf_counter() - start))
+
+        grid.add_piece(max((value, column) for column, value in enumerate(values) if value is not None)[1],
+                       symbols[turn % 2])
+
+    return results
+
+
+def deep_size(obj, seen=None):
+    """
+    Measures the memory used by an object and everything it refers to, counting each object once.
+    Parameters
+    ----------
+    obj
+        The object to measure.
+    seen: set | None
+        The ids of the objects which have already been counted.
+
+    Returns
+    -------
+    int
+        The number of bytes used.
+
+    """
+    if seen is None:
+        seen = set()
+
+    # Small integers are shared by the whole interpreter so they are not counted
+    if id(obj) in seen or isinstance(obj, type) or isinstance(obj, int) and -5 <= obj <= 256:
+        return 0
+
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(key, seen) + deep_size(value, seen) for key, value in obj.items())
+
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_size(item, seen) for item in obj)
+
+    if hasattr(obj, "__dict__"):
+        size += deep_size(obj.__dict__, seen)
+
+    for slot in getattr(type(obj), "__slots__", ()):
+        size += deep_size(getattr(obj, slot), seen)
+
+    return size
+
+
+def benchmark_grids(moves=21, copies=1000):
+    """
+    Measures the memory used by a 7x6 grid and how long it takes to deep copy, for Grid and CompactGrid.
+    Parameters
+    ----------
+    moves: int
+        The number of pieces in the grids, which are placed in random columns.
+    copies: int
+        The number of times each grid is copied.
+
+    Returns
+    -------
+    dict
+        The number of bytes used by each grid and the number of microseconds each copy takes.
+
+    """
+    results = {}
+    for grid_class in (Grid, CompactGrid):
+        generator = random.Random(0)
+        grid = grid_class()
+        for turn in range(moves):
+            columns = [column for column in range(grid.num_columns) if grid.column_height(column) < grid.num_rows]
+            grid.add_piece(generator.choice(columns), ["R", "B"][turn % 2])
+
+        start = time.perf_counter()
+        for _ in range(copies):
+            copy.deepcopy(grid)
+        results[grid_class.__name__] = (deep_size(grid), (time.perf_counter() - start) / copies * 1e6)
+
+    return results
+
+
+def benchmark_parallel_search(depth=10, worker_counts=None):
+    """
+    Measures how much faster the empty 7x6 grid is searched with the moves from the root split between worker
+    processes. Each pool is started and used for a depth 1 search before it is timed, so starting the processes isn't
+    counted.
+    Parameters
+    ----------
+    depth: int
+        The depth to search to.
+    worker_counts: tuple[int] | None
+        The numbers of workers to try, defaults to powers of 2 up to the number of cores.
+
+    Returns
+    -------
+    dict
+        The number of seconds taken and the speedup over searching in one process for each number of workers.
+
+    """
+    cores = os.cpu_count() or 1
+    if worker_counts is None:
+        worker_counts = tuple(2 ** power for power in range(1, cores.bit_length()) if 2 ** power <= cores) or (2,)
+
+    evaluator = Evaluator(Grid(), "R", depth)
+    evaluator.grid_to_int()
+    start = time.perf_counter()
+    evaluator.calculate_move_values()
+    serial = time.perf_counter() - start
+
+    results = {"cores": cores, 1: (serial, 1.0)}
+    for workers in worker_counts:
+        # A new pool each time means the workers' caches are empty
+        shutdown_pools()
+        evaluator = Evaluator(Grid(), "R", 1, workers=workers)
+        evaluator.grid_to_int()
+        evaluator.calculate_move_values()
+
+        evaluator.move_values = []
+        start = time.perf_counter()
+        evaluator.calculate_move_values(depth)
+        elapsed = time.perf_counter() - start
+        results[workers] = (elapsed, serial / elapsed)
+
+    shutdown_pools()
+    return results
+
+
+if __name__ == "__main__":
+    for name, value in benchmark_cache_memory().items():
+        print(f"{name} cache: {value}")
+
+    for (name, depth), (nodes, seconds) in benchmark_move_ordering().items():
+        print(f"{name}, depth {depth}: {nodes} nodes in {seconds:.2f}s")
+
+    for name, value in benchmark_leaf_evaluation().items():
+        print(f"{name}: {value:.0f}")
+
+    for name, value in benchmark_win_detection().items():
+        print(f"{name}: {value:.0f}")
+
+    for turn, (cold, kept) in enumerate(benchmark_cache_reuse()):
+        print(f"move {turn + 1}: new evaluator {cold:.2f}s, kept evaluator {kept:.2f}s")
+
+    for name, (size, microseconds) in benchmark_grids().items():
+        print(f"{name}: {size} bytes, {microseconds:.1f} microseconds per deepcopy")
+
+    results = benchmark_parallel_search()
+    print(f"{results.pop('cores')} cores")
+    for workers, (seconds, speedup) in results.items():
+        print(f"{workers} workers: {seconds:.2f}s, {speedup:.2f}x")
@@ -0,0 +1,199 @@
+# A fixed set of positions to time the computer player on, so changes can be compared against a saved baseline.
+# Run this file directly, for example:
+#     python -m main_project.benchmark_suite --output results.json --baseline baseline.json
+from main_project.connect4_grid import CompactGrid
+from main_project.strategy import Evaluator, Strategy
+import argparse
+import json
+import platform
+import time
+
+# Positions on the 7x6 grid, written as the columns of the moves made from the empty grid. They were taken from games
+# between computer players and sorted into easy and hard by how many nodes a search of them needs.
+POSITION_SETS = {
+    ("opening", "easy"): ["34423443", "11304214", "13242"],
+    ("opening", "hard"): ["1334", "332133", "533243"],
+    ("middlegame", "easy"): ["131233112332223", "131333113314256455", "334532334434452"],
+    ("middlegame", "hard"): ["322232463324443", "332133453422", "121333113454"],
+    ("endgame", "easy"): ["55341332334442412242321161", "535215232233351552312111", "332410222124411334551134553"],
+    ("endgame", "hard"): ["33423332254442542325554511", "11325346342562443233255411", "34233310421111223424244305"],
+}
+
+# The depth each phase is searched to. Endgames with few enough empty cells are searched to the end of the game.
+PHASE_DEPTHS = {"opening": 10, "middlegame": 10, "endgame": 8}
+
+SYMBOLS = ["R", "B"]
+
+
+def position_from_moves(moves: str):
+    """
+    Makes the grid reached by playing the moves from the empty grid.
+    Parameters
+    ----------
+    moves: str
+        The column of each move.
+
+    Returns
+    -------
+    tuple[CompactGrid, str]
+        The grid and the symbol of the player whose turn it is.
+
+    """
+    grid = CompactGrid()
+    for turn, move in enumerate(moves):
+        grid.add_piece(int(move), SYMBOLS[turn % 2])
+
+    return grid, SYMBOLS[len(moves) % 2]
+
+
+def benchmark_position(moves: str, depth: int):
+    """
+    Times the search of one position with a new evaluator, and how long a strategy takes to choose its move.
+    Parameters
+    ----------
+    moves: str
+        The column of each move made to reach the position.
+    depth: int
+        The depth to search to.
+
+    Returns
+    -------
+    dict
+        The number of nodes searched, the seconds taken to reach the depth, the nodes per second and the seconds taken
+        by Strategy.move.
+
+    """
+    grid, symbol = position_from_moves(moves)
+    evaluator = Evaluator(grid, symbol, depth)
+    evaluator.grid_to_int()
+    start = time.perf_counter()
+    evaluator.calculate_move_values()
+    seconds = time.perf_counter() - start
+
+    strategy = Strategy(grid, symbol, depth, 1.0)
+    start = time.perf_counter()
+    strategy.move()
+    move_seconds = time.perf_counter() - start
+
+    return {"moves": moves, "depth": depth, "nodes": evaluator.stats.nodes, "seconds": seconds,
+            "nodes_per_second": evaluator.stats.nodes / seconds if seconds else 0.0, "move_seconds": move_seconds}
+
+
+def run_suite(position_sets=None, depths=None):
+    """
+    Benchmarks every position in the sets.
+    Parameters
+    ----------
+    position_sets: dict | None
+        The positions to benchmark with (phase, difficulty) as the key, defaults to POSITION_SETS.
+    depths: dict | None
+        The depth for each phase, defaults to PHASE_DEPTHS.
+
+    Returns
+    -------
+    dict
+        The results of each position and the totals of each set, keyed by "phase/difficulty".
+
+    """
+    if position_sets is None:
+        position_sets = POSITION_SETS
+
+    if depths is None:
+        depths = PHASE_DEPTHS
+
+    results = {"python": platform.python_version(), "sets": {}}
+    for (phase, difficulty), positions in position_sets.items():
+        position_results = [benchmark_position(moves, depths[phase]) for moves in positions]
+        nodes = sum(result["nodes"] for result in position_results)
+        seconds = sum(result["seconds"] for result in position_results)
+        results["sets"][f"{phase}/{difficulty}"] = {
+            "positions": position_results,
+            "nodes": nodes,
+            "seconds": seconds,
+            "nodes_per_second": nodes / seconds if seconds else 0.0,
+            "move_seconds": sum(result["move_seconds"] for result in position_results)}
+
+    return results
+
+
+def save_results(results: dict, path: str):
+    """
+    Saves benchmark results as JSON.
+    Parameters
+    ----------
+    results: dict
+        The results from run_suite.
+    path: str
+        The path of the file to write.
+
+    """
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2)
+
+
+def load_results(path: str):
+    """
+    Loads benchmark results saved by save_results.
+    Parameters
+    ----------
+    path: str
+        The path of the file.
+
+    Returns
+    -------
+    dict
+        The results.
+
+    """
+    with open(path) as file:
+        return json.load(file)
+
+
+def compare(results: dict, baseline: dict):
+    """
+    Compares benchmark results against a baseline. A speedup above 1 means the new results are faster.
+    Parameters
+    ----------
+    results: dict
+        The new results.
+    baseline: dict
+        The results to compare against.
+
+    Returns
+    -------
+    dict
+        The speedup in search time and move time and the ratio of nodes searched for each set in both results.
+
+    """
+    comparison = {}
+    for name, totals in results["sets"].items():
+        if name not in baseline["sets"]:
+            continue
+
+        old = baseline["sets"][name]
+        comparison[name] = {"speedup": old["seconds"] / totals["seconds"] if totals["seconds"] else 0.0,
+                            "move_speedup": old["move_seconds"] / totals["move_seconds"]
+                            if totals["move_seconds"] else 0.0,
+                            "node_ratio": totals["nodes"] / old["nodes"] if old["nodes"] else 0.0}
+
+    return comparison
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the computer player on the standard positions.")
+    parser.add_argument("--output", help="The file to save the results to.")
+    parser.add_argument("--baseline", help="Results saved earlier to compare against.")
+    arguments = parser.parse_args()
+
+    suite_results = run_suite()
+    for set_name, set_totals in suite_results["sets"].items():
+        print(f"{set_name}: {set_totals['nodes']} nodes in {set_totals['seconds']:.2f}s, "
+              f"{set_totals['nodes_per_second']:.0f} nodes per second, {set_totals['move_seconds']:.2f}s choosing moves")
+
+    if arguments.output:
+        save_results(suite_results, arguments.output)
+
+    if arguments.baseline:
+        for set_name, ratios in compare(suite_results, load_results(arguments.baseline)).items():
+            print(f"{set_name}: {ratios['speedup']:.2f}x search, {ratios['move_speedup']:.2f}x move, "
+                  f"{ratios['node_ratio']:.2f}x nodes")
@@ -1,3 +1,4 @@
+from collections.abc import Mapping
 import random
 
 
@@ -27,17 +28,28 @@ class Grid:
 
         self.rows = [[(row, column) for column in range(self.num_columns)] for row in range(self.num_rows)]
 
+        # Each diagonal has a different row + column, from 0 in one corner to num_rows + num_columns - 2 in the other
         self.SW_diagonals = [
             [(row, column) for row in range(self.num_rows) for column in range(self.num_columns) if row + column == k]
-            for k in range(2 * min(self.num_columns, self.num_rows))]
+            for k in range(self.num_rows + self.num_columns - 1)]
 
         self.SE_diagonals = [
             [(row, self.num_columns - column - 1) for row in range(self.num_rows) for column in range(self.num_columns)
              if row + column == k]
-            for k in range(2 * min(self.num_columns, self.num_rows))]
+            for k in range(self.num_rows + self.num_columns - 1)]
 
         self.all_lines = self.columns + self.rows + self.SW_diagonals + self.SE_diagonals
 
+        # The pieces of each symbol and all the pieces are also kept as bitboards, which the computer player searches
+        # with. Each column is num_rows + 1 bits with the bottom row as the lowest bit, and the leftmost column uses
+        # the highest bits.
+        self.bitboards: dict = {}
+        self.mask = 0
+
+        # The number of pieces in each column and in the whole grid
+        self.heights = [0] * self.num_columns
+        self.num_pieces = 0
+
     def column_height(self, column: int):
         """
         Returns the number of pieces in a column.
@@ -52,10 +64,15 @@ class Grid:
         int
             The height of the column.
 
+        Raises
+        ------
+        ValueError
+            If the column is not on the grid.
+
         """
-        if not (isinstance(column, int) and -1 <= column <= self.num_columns):
+        if not (isinstance(column, int) and 0 <= column < self.num_columns):
             raise ValueError
-        return sum([1 if not self.cells[cell].is_empty() else 0 for cell in self.columns[column]])
+        return self.heights[column]
 
     def add_piece(self, column: int, symbol: str):
         """
@@ -74,21 +91,15 @@ class Grid:
             If the column is full or not on the grid.
 
         """
-        added = False
-        count = 0
-        # Loop up the column until a free cell is encountered and then stop looping up
-        while not added and count < self.num_columns:
-            if self.cells[self.columns[column][count]].is_empty():
-                added = True
-                self.cells[self.columns[column][count]].set_symbol(symbol)
-
-            else:
-                count += 1
+        if not 0 <= column < self.num_columns:
+            raise IndexError("Column is not on the grid.")
 
-        if not added:
-            # If it loops through the column without finding an empty cell it will raise an IndexError
+        # The piece lands on top of the pieces already in the column
+        if self.heights[column] == self.num_rows:
             raise IndexError("Column is full.")
 
+        self.set_cell(self.heights[column], column, symbol)
+
     def check_win(self):
         """
         Checks to see if the grid has an n in a row.
@@ -101,6 +112,43 @@ class Grid:
         # Check line on all the lines and then see if any of them have a win
         return any([self.check_line(line) for line in self.all_lines])
 
+    def check_win_from(self, row: int, column: int):
+        """
+        Checks to see if there is an n in a row through a cell. Only lines through the last piece added can have
+        changed, so this is all that needs checking after each move.
+        Parameters
+        ----------
+        row: int
+            The row of the cell.
+        column: int
+            The column of the cell.
+
+        Returns
+        -------
+        bool
+            Whether there is an n in a row through the cell.
+
+        """
+        symbol = self.cells[(row, column)].symbol
+        if symbol is None:
+            return False
+
+        for row_step, column_step in [(1, 0), (0, 1), (1, 1), (1, -1)]:
+            count = 1
+            # Count the pieces with the same symbol on each side of the cell
+            for direction in (1, -1):
+                next_row, next_column = row + direction * row_step, column + direction * column_step
+                while (next_row, next_column) in self.cells and self.cells[(next_row, next_column)].symbol == symbol:
+                    count += 1
+                    next_row += direction * row_step
+                    next_column += direction * column_step
+
+            if count >= self.win_num:
+                self.winning_symbol = symbol
+                return True
+
+        return False
+
     def check_line(self, line: list):
         """
         Checks to see if a line has an n in a row.
@@ -161,10 +209,70 @@ class Grid:
             Whether the grid is full.
 
         """
-        return all([self.line_full(line) for line in self.all_lines])
+        return self.num_pieces == self.num_rows * self.num_columns
 
     def set_cell(self, row, column, symbol):
-        self.cells[(row, column)].set_symbol(symbol)
+        """
+        Sets the symbol of a cell and updates the bitboards and piece counts.
+        Parameters
+        ----------
+        row: int
+            The row of the cell.
+        column: int
+            The column of the cell.
+        symbol: str | None
+            The new symbol of the cell, or None to empty it.
+
+        """
+        cell = self.cells[(row, column)]
+        bit = self.cell_bit(row, column)
+        if not cell.is_empty():
+            self.bitboards[cell.symbol] ^= bit
+            self.mask ^= bit
+            self.heights[column] -= 1
+            self.num_pieces -= 1
+
+        if symbol is not None:
+            self.bitboards[symbol] = self.bitboards.get(symbol, 0) | bit
+            self.mask |= bit
+            self.heights[column] += 1
+            self.num_pieces += 1
+
+        cell.set_symbol(symbol)
+
+    def cell_bit(self, row: int, column: int):
+        """
+        Finds the bit of a cell in the bitboards.
+        Parameters
+        ----------
+        row: int
+            The row of the cell.
+        column: int
+            The column of the cell.
+
+        Returns
+        -------
+        int
+            The bitboard with only that cell set.
+
+        """
+        return 1 << ((self.num_columns - 1 - column) * (self.num_rows + 1) + row)
+
+    def get_bitboard(self, symbol: str):
+        """
+        Gets the bitboard of a symbol's pieces.
+        Parameters
+        ----------
+        symbol: str
+            The symbol of the pieces.
+
+        Returns
+        -------
+        int
+            The bitboard with the cells that have the symbol set.
+
+        """
+        return self.bitboards.get(symbol, 0)
 
     def random_fill(self, n):
         """
@@ -292,5 +400,338 @@ class Cell:
         return f"Cell({self.row=}, {self.column=}, {self.symbol=})"
 
 
+class CompactGrid:
+    # Only these attributes can be set, so instances don't need a dictionary for their attributes
+    __slots__ = ("num_rows", "num_columns", "win_num", "winning_symbol", "bitboards", "mask", "heights",
+                 "num_pieces")
+
+    def __init__(self, num_rows=6, num_columns=7, win_num=4):
+        """
+        A grid with the same methods as Grid which only stores bitboards and the height of each column, so it is
+        much smaller and faster to copy.
+        Parameters
+        ----------
+        num_rows: int
+            The number of rows in the grid.
+        num_columns: int
+            The number of columns in the grid.
+        win_num: int
+            The number of symbols in a row needed to win.
+        """
+        self.win_num = win_num
+        self.num_rows = num_rows
+        self.num_columns = num_columns
+        self.winning_symbol = None
+
+        # The bitboards use the same layout as in Grid
+        self.bitboards: dict = {}
+        self.mask = 0
+        self.heights = [0] * num_columns
+        self.num_pieces = 0
+
+    @property
+    def cells(self):
+        # The cells are made when they are looked at, so changing them doesn't change the grid
+        return CompactCells(self)
+
+    @property
+    def columns(self):
+        return [[(row, column) for row in range(self.num_rows)] for column in range(self.num_columns)]
+
+    @property
+    def rows(self):
+        return [[(row, column) for column in range(self.num_columns)] for row in range(self.num_rows)]
+
+    def column_height(self, column: int):
+        """
+        Returns the number of pieces in a column.
+
+        Parameters
+        ----------
+        column: int
+            The column in the grid.
+
+        Returns
+        -------
+        int
+            The height of the column.
+
+        Raises
+        ------
+        ValueError
+            If the column is not on the grid.
+
+        """
+        if not (isinstance(column, int) and 0 <= column < self.num_columns):
+            raise ValueError
+        return self.heights[column]
+
+    def add_piece(self, column: int, symbol: str):
+        """
+        Adds a piece to a column in the grid.
+
+        Parameters
+        ----------
+        column: int
+            The column the piece is being added too.
+        symbol: str
+            The symbol of the piece being added.
+
+        Raises
+        ------
+        IndexError
+            If the column is full or not on the grid.
+
+        """
+        if not 0 <= column < self.num_columns:
+            raise IndexError("Column is not on the grid.")
+
+        if self.heights[column] == self.num_rows:
+            raise IndexError("Column is full.")
+
+        bit = self.cell_bit(self.heights[column], column)
+        self.bitboards[symbol] = self.bitboards.get(symbol, 0) | bit
+        self.mask |= bit
+        self.heights[column] += 1
+        self.num_pieces += 1
+
+    def set_cell(self, row, column, symbol):
+        """
+        Sets the symbol of a cell.
+        Parameters
+        ----------
+        row: int
+            The row of the cell.
+        column: int
+            The column of the cell.
+        symbol: str | None
+            The new symbol of the cell, or None to empty it.
+
+        """
+        bit = self.cell_bit(row, column)
+        for other_symbol in self.bitboards:
+            self.bitboards[other_symbol] &= ~bit
+
+        self.mask &= ~bit
+        if symbol is not None:
+            self.bitboards[symbol] = self.bitboards.get(symbol, 0) | bit
+            self.mask |= bit
+
+        column_bits = (1 << (self.num_rows + 1)) - 1
+        self.heights[column] = (self.mask >> ((self.num_columns - 1 - column) * (self.num_rows + 1))
+                                & column_bits).bit_count()
+        self.num_pieces = self.mask.bit_count()
+
+    def check_win(self):
+        """
+        Checks to see if the grid has an n in a row.
+        Returns
+        -------
+        bool
+            whether the grid has an n in a row.
+
+        """
+        for symbol, bitboard in self.bitboards.items():
+            if self.check_bitboard(bitboard):
+                self.winning_symbol = symbol
+                return True
+
+        return False
+
+    def check_win_from(self, row: int, column: int):
+        """
+        Checks to see if there is an n in a row through a cell. Only lines through the last piece added can have
+        changed, so this is all that needs checking after each move.
+        Parameters
+        ----------
+        row: int
+            The row of the cell.
+        column: int
+            The column of the cell.
+
+        Returns
+        -------
+        bool
+            Whether there is an n in a row through the cell.
+
+        """
+        bit = self.cell_bit(row, column)
+        for symbol, bitboard in self.bitboards.items():
+            if not bitboard & bit:
+                continue
+
+            # The empty bit at the top of each column stops lines wrapping onto the next column
+            for direction in (1, self.num_rows + 1, self.num_rows, self.num_rows + 2):
+                count = 1
+                cell = bit << direction
+                while bitboard & cell:
+                    count += 1
+                    cell <<= direction
+
+                cell = bit >> direction
+                while bitboard & cell:
+                    count += 1
+                    cell >>= direction
+
+                if count >= self.win_num:
+                    self.winning_symbol = symbol
+                    return True
+
+        return False
+
+    def check_bitboard(self, bitboard: int):
+        """
+        Checks to see if a bitboard has an n in a row.
+        Parameters
+        ----------
+        bitboard: int
+            The bitboard to check.
+
+        Returns
+        -------
+        bool
+            Whether the bitboard has an n in a row.
+
+        """
+        # The shift to the next cell vertically, horizontally, diagonally / and diagonally \. The empty bit at the top
+        # of each column stops lines wrapping onto the next column.
+        for direction in (1, self.num_rows + 1, self.num_rows, self.num_rows + 2):
+            line = bitboard
+            for _ in range(self.win_num - 1):
+                line &= line >> direction
+
+            if line:
+                return True
+
+        return False
+
+    def grid_full(self):
+        """
+        Checks to see if the grid is full.
+        Returns
+        -------
+        bool
+            Whether the grid is full.
+
+        """
+        return self.num_pieces == self.num_rows * self.num_columns
+
+    def cell_bit(self, row: int, column: int):
+        """
+        Finds the bit of a cell in the bitboards.
+        Parameters
+        ----------
+        row: int
+            The row of the cell.
+        column: int
+            The column of the cell.
+
+        Returns
+        -------
+        int
+            The bitboard with only that cell set.
+
+        """
+        return 1 << ((self.num_columns - 1 - column) * (self.num_rows + 1) + row)
+
+    def get_bitboard(self, symbol: str):
+        """
+        Gets the bitboard of a symbol's pieces.
+        Parameters
+        ----------
+        symbol: str
+            The symbol of the pieces.
+
+        Returns
+        -------
+        int
+            The bitboard with the cells that have the symbol set.
+
+        """
+        return self.bitboards.get(symbol, 0)
+
+    def __deepcopy__(self, memo):
+        # Everything apart from the dictionary and list is immutable, so only they need copying
+        grid = CompactGrid.__new__(CompactGrid)
+        grid.num_rows = self.num_rows
+        grid.num_columns = self.num_columns
+        grid.win_num = self.win_num
+        grid.winning_symbol = self.winning_symbol
+        grid.bitboards = self.bitboards.copy()
+        grid.mask = self.mask
+        grid.heights = self.heights.copy()
+        grid.num_pieces = self.num_pieces
+        return grid
+
+    def __repr__(self):
+        """
+        __repr__ function for grid.
+        Returns
+        -------
+        str
+            CompactGrid(num_rows, num_columns, win_num)
+
+        """
+        return f"CompactGrid({self.num_rows=}, {self.num_columns=}, {self.win_num=})"
+
+    def __str__(self):
+        """
+        __str__ function which shows the grid in an understandable way.
+        Returns
+        -------
+        str
+            All the cells including end lines
+
+        """
+        return_str = ""
+        cells = self.cells
+        for row in range(self.num_rows - 1, -1, -1):
+            for column in range(self.num_columns):
+                if cells[(row, column)].is_empty():
+                    return_str += "|_| "
+
+                else:
+                    return_str += "|" + cells[(row, column)].symbol[0] + "| "
+
+            return_str += "\n"
+
+        for column in range(self.num_columns):
+            return_str += f" {column + 1}  "
+
+        return return_str
+
+
+class CompactCells(Mapping):
+    def __init__(self, grid: CompactGrid):
+        """
+        The cells of a compact grid, keyed by (row, column) like Grid.cells.
+        Parameters
+        ----------
+        grid: CompactGrid
+            The grid the cells are in.
+
+        """
+        self.grid = grid
+
+    def __getitem__(self, coordinates):
+        row, column = coordinates
+        if not (0 <= row < self.grid.num_rows and 0 <= column < self.grid.num_columns):
+            raise KeyError(coordinates)
+
+        cell = Cell(row, column)
+        bit = self.grid.cell_bit(row, column)
+        for symbol, bitboard in self.grid.bitboards.items():
+            if bitboard & bit:
+                cell.set_symbol(symbol)
+
+        return cell
+
+    def __iter__(self):
+        return ((row, column) for row in range(self.grid.num_rows) for column in range(self.grid.num_columns))
+
+    def __len__(self):
+        return self.grid.num_rows * self.grid.num_columns
+
+
 if __name__ == "__main__":
     pass
@@ -1,4 +1,5 @@
 from main_project.back_end import Game, Player
+from main_project.analysis_store import open_store
 import pyinputplus
 from colorama import Fore, Style
 import math
@@ -15,7 +16,7 @@ class Interface:
     def get_move(self, player: Player):
         pass
 
-    def display_grid(self):
+    def display_grid(self, grid=None, highlighted_moves=None):
         pass
 
     def display_move(self, move: int):
@@ -27,6 +28,29 @@ class Interface:
     def display_draw(self):
         pass
 
+    @staticmethod
+    def val_to_result(value):
+        """
+        Converts the exact value of a move into the result of the game.
+        Parameters
+        ----------
+        value: tuple | None
+            The value of the move and how many moves away the game ends.
+
+        Returns
+        -------
+        str:
+            The result of the game if the move is made.
+
+        """
+        if value is None:
+            return "!"
+        if value[0] == math.inf:
+            return f"Win in {(value[1] + 2) // 2}"  # The length doesn't include the move itself
+        if value[0] == -math.inf:
+            return f"Loss in {(value[1] + 1) // 2}"
+        return "Draw"
+
     def display_invalid_move(self, error):
         pass
 
@@ -34,6 +58,11 @@ class Interface:
         pass
 
 
+class NullInterface(Interface):
+    # An interface which doesn't show anything, for games between computer players
+    pass
+
+
 class CLI(Interface):
     difficulty_dictionary = {"Very Easy": 0,
                              "Easy": 1,
@@ -63,10 +92,10 @@ class CLI(Interface):
             columns = pyinputplus.inputInt("Enter columns: ", min=1)
             rows = pyinputplus.inputInt("Enter rows: ", min=1)
             win_number = pyinputplus.inputInt("Enter win number: ", min=1)
-            self.game = Game(self, rows, columns, win_number)
+            self.game = Game(self, rows, columns, win_number, analysis_store=open_store())
 
         else:
-            self.game = Game(self)
+            self.game = Game(self, analysis_store=open_store())
 
         for _ in range(2):
             self.add_player()
@@ -249,9 +278,17 @@ class CLI(Interface):
             evaluate_choice = pyinputplus.inputYesNo("Do you want to evaluate the next move. Y/N") == "yes"
             if evaluate_choice:
 
-                move_values = self.game.evaluate_move(turn_choice - 1)
+                move_values, solved = self.game.analyse_turn(turn_choice - 1)
+                if solved:
+                    print("There are few enough moves left that these results are certain.")
+
                 for i in range(len(move_values)):
-                    print(f"Move {i + 1}: {self.val_to_symbol(move_values[i])}")
+                    if solved:
+                        print(f"Move {i + 1}: {self.val_to_result(move_values[i])}")
+
+                    else:
+                        value = move_values[i] if move_values[i] is None else move_values[i][0]
+                        print(f"Move {i + 1}: {self.val_to_symbol(value)}")
 
             player_choice = pyinputplus.inputYesNo("Do you want to analyse a different turn. Y/N") == "yes"
 
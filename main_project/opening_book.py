@@ -0,0 +1,227 @@
+from main_project.connect4_grid import Grid
+from main_project.paths import data_path
+from main_project.strategy import Evaluator
+import mmap
+import os
+import struct
+
+# The book file starts with a header and is followed by fixed size entries sorted by key, so it can be binary
+# searched without being read into memory.
+MAGIC = b"C4BK"
+VERSION = 2
+HEADER = struct.Struct("<4sHBBBBBI")  # magic, version, rows, columns, win number, plies, depth, number of entries
+ENTRY = struct.Struct("<Qbi")  # key, best move, score
+# Version 1 books don't store the depth they were searched to, which was always the default depth of generate_book
+HEADER_V1 = struct.Struct("<4sHBBBBI")
+DEFAULT_BOOK_DEPTH = 12
+
+DEFAULT_BOOK_PATH = data_path("opening_book.bin")
+
+_open_books: dict = {}  # Books which have already been opened by this process, with the path as the key
+
+
+class OpeningBook:
+    def __init__(self, path: str):
+        """
+        Opens an opening book. The file is memory-mapped read only, so every process using the same book shares one
+        copy of it in memory.
+        Parameters
+        ----------
+        path: str
+            The path of the book file.
+
+        Raises
+        ------
+        ValueError
+            If the file is not an opening book.
+
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._map) < HEADER.size:
+            raise ValueError(f"{path} is not an opening book.")
+
+        magic, version = HEADER.unpack_from(self._map, 0)[:2]
+        if version == 1:
+            _, _, self.num_rows, self.num_columns, self.win_num, self.plies, self.num_entries = \
+                HEADER_V1.unpack_from(self._map, 0)
+            self.depth = DEFAULT_BOOK_DEPTH
+            self._entries_start = HEADER_V1.size
+
+        else:
+            _, _, self.num_rows, self.num_columns, self.win_num, self.plies, self.depth, self.num_entries = \
+                HEADER.unpack_from(self._map, 0)
+            self._entries_start = HEADER.size
+
+        if (magic != MAGIC or version not in (1, VERSION)
+                or len(self._map) != self._entries_start + self.num_entries * ENTRY.size):
+            raise ValueError(f"{path} is not an opening book.")
+
+        # The evaluator is only used to find the key of a grid, so it doesn't need a cache
+        self._evaluator = Evaluator(Grid(self.num_rows, self.num_columns, self.win_num), "", 0, cache_size=1)
+
+    def fits(self, grid: Grid):
+        """
+        Checks whether the book was made for grids with the same rules as the given grid.
+        Parameters
+        ----------
+        grid: Grid
+            The grid to check.
+
+        Returns
+        -------
+        bool
+            Whether the book can be used for the grid.
+
+        """
+        return (grid.num_rows, grid.num_columns, grid.win_num) == (self.num_rows, self.num_columns, self.win_num)
+
+    def lookup(self, mask: int, position: int):
+        """
+        Finds the best move for a grid in the book.
+        Parameters
+        ----------
+        mask: int
+            The mask of the grid.
+        position: int
+            The position of the player whose turn it is.
+
+        Returns
+        -------
+        tuple[int, int] | None
+            The best move and its score, or None if the grid isn't in the book.
+
+        """
+        if mask.bit_count() > self.plies:
+            return None
+
+        key, mirrored = self._evaluator.cache_key(mask, position)
+        low, high = 0, self.num_entries - 1
+        while low <= high:
+            middle = (low + high) // 2
+            entry_key, move, score = ENTRY.unpack_from(self._map, self._entries_start + middle * ENTRY.size)
+            if entry_key == key:
+                # Moves are stored for the grid with the smaller key, so we might need to mirror it
+                return (self.num_columns - 1 - move if mirrored else move), score
+
+            elif entry_key < key:
+                low = middle + 1
+
+            else:
+                high = middle - 1
+
+        return None
+
+    def close(self):
+        """
+        Closes the memory-mapped file.
+
+        """
+        self._map.close()
+        _open_books.pop(self.path, None)
+
+    def __len__(self):
+        return self.num_entries
+
+    def __repr__(self):
+        return f"OpeningBook({self.path=}, {self.plies=}, {self.depth=}, {self.num_entries=})"
+
+
+def load_book(path=DEFAULT_BOOK_PATH):
+    """
+    Gets the opening book at the path, opening it if this process hasn't already.
+    Parameters
+    ----------
+    path: str
+        The path of the book file.
+
+    Returns
+    -------
+    OpeningBook | None
+        The opening book, or None if there is no book at the path.
+
+    """
+    if path not in _open_books:
+        if not os.path.exists(path):
+            return None
+
+        _open_books[path] = OpeningBook(path)
+
+    return _open_books[path]
+
+
+def generate_book(path=DEFAULT_BOOK_PATH, plies=4, depth=DEFAULT_BOOK_DEPTH, num_rows=6, num_columns=7, win_num=4):
+    """
+    Searches every grid that can be reached in the first few moves and writes the best move for each to a book.
+    Parameters
+    ----------
+    path: str
+        The path to write the book to.
+    plies: int
+        The number of moves that have been made in the last grids in the book.
+    depth: int
+        The depth to search each grid to.
+    num_rows: int
+        The number of rows in the grid.
+    num_columns: int
+        The number of columns in the grid.
+    win_num: int
+        The number of symbols in a row needed to win.
+
+    Returns
+    -------
+    int
+        The number of grids in the book.
+
+    Raises
+    ------
+    ValueError
+        If the keys of the grid don't fit in 64 bits.
+
+    """
+    if num_columns * (num_rows + 1) > 64:
+        raise ValueError("The grid is too large for an opening book.")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    evaluator = Evaluator(Grid(num_rows, num_columns, win_num), "", depth)
+    full_grid = evaluator.calculate_full_grid()
+    entries = {}
+    grids = [(0, 0)]
+    for ply in range(plies + 1):
+        next_grids = []
+        for mask, position in grids:
+            key, _ = evaluator.cache_key(mask, position)
+            if key in entries:
+                continue
+
+            # We search the grid with the smaller key so the move is stored for that grid
+            mask, position = evaluator.unpack_key(key)
+            score, move = evaluator.search_root(mask, position, depth)
+            entries[key] = (move, score)
+            if ply == plies:
+                continue
+
+            for column in range(num_columns):
+                if evaluator.check_bit(mask, column, 0):
+                    continue
+
+                new_mask, new_position, _ = evaluator.make_move(mask, position, column)
+                # Grids where the game has already ended don't need a move
+                if new_mask != full_grid and not evaluator.check_n_in_a_row(new_position ^ new_mask):
+                    next_grids.append((new_mask, new_position))
+
+        grids = next_grids
+
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, num_rows, num_columns, win_num, plies, depth, len(entries)))
+        for key in sorted(entries):
+            file.write(ENTRY.pack(key, *entries[key]))
+
+    return len(entries)
+
+
+if __name__ == "__main__":
+    print(f"Wrote {generate_book()} grids to {DEFAULT_BOOK_PATH}.")
@@ -0,0 +1,42 @@
+# Where files made by the program, such as the opening book and the analysis store, are kept by default.
+import os
+
+DATA_ENV = "CONNECT4_DATA"
+
+
+def data_directory():
+    """
+    Finds the directory to keep the program's files in. CONNECT4_DATA is used if it is set, otherwise the user's data
+    directory, so nothing is written inside the package.
+    Returns
+    -------
+    str
+        The path of the directory, which might not exist yet.
+
+    """
+    if os.environ.get(DATA_ENV):
+        return os.environ[DATA_ENV]
+
+    if os.name == "nt":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~")
+
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+
+    return os.path.join(base, "connect4")
+
+
+def data_path(filename: str):
+    """
+    Parameters
+    ----------
+    filename: str
+        The name of the file.
+
+    Returns
+    -------
+    str
+        The path of the file in the data directory.
+
+    """
+    return os.path.join(data_directory(), filename)
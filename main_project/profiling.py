@@ -0,0 +1,188 @@
+# Opt-in profiling of each move. Turn it on with enable_profiling, or by setting CONNECT4_PROFILE to the directory to
+# write the profiles to and optionally CONNECT4_PROFILE_FORMAT to "pstats" or "chrome".
+from contextlib import contextmanager
+import cProfile
+import json
+import os
+import pstats
+import re
+
+PROFILE_ENV = "CONNECT4_PROFILE"
+FORMAT_ENV = "CONNECT4_PROFILE_FORMAT"
+FORMATS = ("pstats", "chrome")
+
+# Functions taking less than this many seconds in a chrome trace are left out to keep the file small
+MIN_TRACE_SECONDS = 0.00005
+
+# The directory and format to write profiles with, empty while profiling is off
+_settings: dict = {}
+_running = [False]  # Whether a move is being profiled, since a profile can't be started inside another one
+
+
+def enable_profiling(directory: str, trace_format="pstats"):
+    """
+    Profiles every move made after this is called, writing one file for each move.
+    Parameters
+    ----------
+    directory: str
+        The directory to write the profiles to, which is made if it doesn't exist.
+    trace_format: str
+        Either "pstats" for files which can be read with the pstats module or snakeviz, or "chrome" for JSON which can
+        be opened in chrome://tracing or Perfetto.
+
+    Raises
+    ------
+    ValueError
+        If the format isn't recognised.
+
+    """
+    if trace_format not in FORMATS:
+        raise ValueError(f"Unknown profile format: {trace_format}.")
+
+    os.makedirs(directory, exist_ok=True)
+    _settings["directory"] = directory
+    _settings["format"] = trace_format
+
+
+def disable_profiling():
+    """
+    Stops profiling moves.
+
+    """
+    _settings.clear()
+
+
+def profiling_enabled():
+    """
+    Returns
+    -------
+    bool
+        Whether moves are being profiled.
+
+    """
+    return bool(_settings)
+
+
+def profile_path(game_id, turn: int, label: str):
+    """
+    Finds the path of the file a move's profile is written to.
+    Parameters
+    ----------
+    game_id: str | None
+        The ID of the game, or None if the move isn't part of a game.
+    turn: int
+        The turn number of the move.
+    label: str
+        What made the move, such as the player's name.
+
+    Returns
+    -------
+    str
+        The path of the file.
+
+    """
+    # Names can contain characters which aren't allowed in file names
+    label = re.sub(r"[^A-Za-z0-9_-]", "_", label)
+    extension = "prof" if _settings["format"] == "pstats" else "json"
+    return os.path.join(_settings["directory"], f"{game_id or 'nogame'}-turn{turn:03d}-{label}.{extension}")
+
+
+@contextmanager
+def profile_move(game_id, turn: int, label: str):
+    """
+    Profiles the code run inside the with statement if profiling is on. If a move is already being profiled the
+    profile of that move includes this code, so no separate profile is made.
+    Parameters
+    ----------
+    game_id: str | None
+        The ID of the game, or None if the move isn't part of a game.
+    turn: int
+        The turn number of the move.
+    label: str
+        What made the move, such as the player's name.
+
+    """
+    if not _settings or _running[0]:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    _running[0] = True
+    profiler.enable()
+    try:
+        yield
+
+    finally:
+        profiler.disable()
+        _running[0] = False
+        # Profiling might have been turned off during the move
+        if _settings:
+            path = profile_path(game_id, turn, label)
+            if _settings["format"] == "pstats":
+                profiler.dump_stats(path)
+
+            else:
+                with open(path, "w") as file:
+                    json.dump(chrome_trace(pstats.Stats(profiler), game_id, turn, label), file)
+
+
+def chrome_trace(stats: pstats.Stats, game_id, turn: int, label: str):
+    """
+    Converts a profile into the Chrome trace event format. cProfile only records the total time of each function for
+    each caller, so the trace is a flame graph: each function's callees are laid out one after another inside it, with
+    the time they took when called from it. The order of the calls is not kept.
+    Parameters
+    ----------
+    stats: pstats.Stats
+        The profile.
+    game_id: str | None
+        The ID of the game, which is stored in the trace.
+    turn: int
+        The turn number of the move, which is stored in the trace.
+    label: str
+        What made the move, which is stored in the trace.
+
+    Returns
+    -------
+    dict
+        The trace, which can be written as JSON.
+
+    """
+    # For each function, the functions it called with the cumulative time of the calls
+    callees: dict = {}
+    for function, (_, _, _, _, callers) in stats.stats.items():
+        for caller, (_, _, _, cumulative) in callers.items():
+            callees.setdefault(caller, []).append((cumulative, function))
+
+    events = []
+
+    def add_events(function, start: float, duration: float, path: set):
+        # Times in a trace are in microseconds
+        calls, _, own_time, _, _ = stats.stats[function]
+        filename, line, name = function
+        events.append({"name": name, "cat": "python", "ph": "X", "pid": 0, "tid": 0, "ts": start * 1e6,
+                       "dur": duration * 1e6, "args": {"file": f"{filename}:{line}", "calls": calls,
+                                                       "own_seconds": own_time}})
+        cursor = start
+        for cumulative, callee in sorted(callees.get(function, []), reverse=True):
+            # Recursive calls are already counted in the time of the outer call
+            if callee in path or cumulative < MIN_TRACE_SECONDS:
+                continue
+
+            # Rounding can make the callees add up to slightly more than the caller
+            cumulative = min(cumulative, start + duration - cursor)
+            add_events(callee, cursor, cumulative, path | {callee})
+            cursor += cumulative
+
+    cursor = 0.0
+    roots = [function for function, (_, _, _, _, callers) in stats.stats.items() if not callers]
+    for root in sorted(roots, key=lambda function: stats.stats[function][3], reverse=True):
+        add_events(root, cursor, stats.stats[root][3], {root})
+        cursor += stats.stats[root][3]
+
+    return {"traceEvents": events, "displayTimeUnit": "ms",
+            "otherData": {"game_id": game_id, "turn": turn, "label": label}}
+
+
+if os.environ.get(PROFILE_ENV):
+    enable_profiling(os.environ[PROFILE_ENV], os.environ.get(FORMAT_ENV, "pstats"))
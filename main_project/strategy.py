@@ -1,11 +1,235 @@
 from main_project.connect4_grid import Grid
-from collections import defaultdict
+from main_project.transposition import TranspositionTable, SharedTranspositionTable, EXACT, LOWER, UPPER, table_size
+from main_project.profiling import profile_move
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import util
+import logging
 import math
 import random
+import time
+
+
+WIN_SCORE = 1000000  # Larger than any heuristic score, wins score this plus the number of empty cells left
+MAX_SCORE = 2 * WIN_SCORE  # Larger than any score, used as infinity by the search
+
+# The search counts of every move are logged here at debug level, so they can be collected without changing the game
+logger = logging.getLogger(__name__)
+
+
+# Heuristic weights and their bit planes which have already been calculated, with (rows, columns, win_num) as the key
+_line_weights: dict = {}
+_weight_planes: dict = {}
+
+
+def line_weights(num_rows: int, num_columns: int, win_num: int):
+    """
+    Counts the number of lines of win_num cells that each cell is part of, which is how useful a piece there is.
+    The weights are only calculated the first time they are needed for each set of rules.
+    Parameters
+    ----------
+    num_rows: int
+        The number of rows in the grid.
+    num_columns: int
+        The number of columns in the grid.
+    win_num: int
+        The number of symbols in a row needed to win.
+
+    Returns
+    -------
+    list[list[int]]
+        The weight of each cell, with the top row first.
+
+    """
+    rules = (num_rows, num_columns, win_num)
+    if rules not in _line_weights:
+        weights = [[0 for _ in range(num_columns)] for _ in range(num_rows)]
+        for row_step, column_step in [(0, 1), (1, 0), (1, 1), (1, -1)]:
+            for row in range(num_rows):
+                for column in range(num_columns):
+                    # Only count the line if its last cell is still on the grid
+                    end_row = row + (win_num - 1) * row_step
+                    end_column = column + (win_num - 1) * column_step
+                    if 0 <= end_row < num_rows and 0 <= end_column < num_columns:
+                        for index in range(win_num):
+                            weights[row + index * row_step][column + index * column_step] += 1
+
+        _line_weights[rules] = weights
+
+    return _line_weights[rules]
+
+
+class SearchTimeout(Exception):
+    # Raised inside the search when the time limit for a move has been reached
+    pass
+
+
+class SearchStats:
+    __slots__ = ("nodes", "leaves", "cache_probes", "cache_hits", "cache_stores", "cutoffs", "cutoff_indices",
+                 "root_ply", "max_ply")
+
+    def __init__(self, num_columns: int, root_ply=0):
+        """
+        Counts what the search does, so a slow move can be explained. The counters are plain integers so they are
+        cheap enough to always be updated.
+        Parameters
+        ----------
+        num_columns: int
+            The number of columns in the grid, which is the most moves a position can have.
+        root_ply: int
+            The number of pieces in the grid the search started from.
+
+        """
+        self.nodes = 0  # Positions visited
+        self.leaves = 0  # Positions scored without searching their moves, because of the depth or the end of the game
+        self.cache_probes = 0
+        self.cache_hits = 0
+        self.cache_stores = 0
+        self.cutoffs = 0  # Beta cutoffs in the move loop
+        self.cutoff_indices = [0] * num_columns  # The number of cutoffs caused by the first, second, third... move
+        self.root_ply = root_ply
+        self.max_ply = root_ply  # The most pieces in any grid the search reached
+
+    @property
+    def max_depth(self):
+        return self.max_ply - self.root_ply
+
+    def merge(self, other):
+        """
+        Adds the counts from another search, such as one made in a worker process.
+        Parameters
+        ----------
+        other: SearchStats
+            The counts to add.
+
+        """
+        self.nodes += other.nodes
+        self.leaves += other.leaves
+        self.cache_probes += other.cache_probes
+        self.cache_hits += other.cache_hits
+        self.cache_stores += other.cache_stores
+        self.cutoffs += other.cutoffs
+        for index, count in enumerate(other.cutoff_indices):
+            self.cutoff_indices[index] += count
+
+        self.max_ply = max(self.max_ply, other.max_ply)
+
+    def as_dict(self):
+        """
+        Returns
+        -------
+        dict
+            The counts, the rate of cache hits and cutoffs caused by the first move, and the deepest ply reached.
+
+        """
+        return {"nodes": self.nodes, "leaves": self.leaves, "cache_probes": self.cache_probes,
+                "cache_hits": self.cache_hits, "cache_stores": self.cache_stores,
+                "cache_hit_rate": self.cache_hits / self.cache_probes if self.cache_probes else 0.0,
+                "cutoffs": self.cutoffs, "cutoff_indices": list(self.cutoff_indices),
+                "first_move_cutoff_rate": self.cutoff_indices[0] / self.cutoffs if self.cutoffs else 0.0,
+                "max_depth": self.max_depth}
+
+    def __repr__(self):
+        return f"SearchStats({self.as_dict()})"
+
+
+_pools: dict = {}  # Worker pools which have already been started by this process, with the number of workers as the key
+# The evaluator each worker process searches with, kept between searches so its cache and move ordering stay warm
+_worker_evaluators: dict = {}
+
+
+def get_pool(workers: int):
+    """
+    Gets a pool of worker processes, starting it if this process hasn't already. The pool is reused by every
+    evaluator that searches with the same number of workers.
+    Parameters
+    ----------
+    workers: int
+        The number of worker processes.
+
+    Returns
+    -------
+    ProcessPoolExecutor
+        The pool of worker processes.
+
+    """
+    if workers not in _pools:
+        _pools[workers] = ProcessPoolExecutor(workers)
+
+    return _pools[workers]
+
+
+def shutdown_pools():
+    """
+    Stops every worker pool started by this process.
+
+    """
+    for pool in _pools.values():
+        pool.shutdown(cancel_futures=True)
+
+    _pools.clear()
+
+
+def search_move(rules: tuple, settings: tuple, mask: int, position: int, depth: int, deadline=None,
+                generation=0) -> tuple:
+    """
+    Searches a position in a worker process. Each worker keeps one evaluator for each set of rules and settings.
+    Parameters
+    ----------
+    rules: tuple[int, int, int]
+        The number of rows, number of columns and win number of the grid.
+    settings: tuple
+        The keyword arguments of the evaluator as (name, value) pairs, and the name of the shared cache if there is
+        one.
+    mask: int
+        The mask of the grid.
+    position: int
+        The position of the player whose turn it is.
+    depth: int
+        The depth to search to.
+    deadline: float | None
+        The time at which the search has to stop.
+    generation: int
+        The cache generation of the search in the main process.
+
+    Returns
+    -------
+    tuple[int, SearchStats]
+        The score of the position for the player whose turn it is and the counts of the search.
+
+    Raises
+    ------
+    SearchTimeout
+        If the deadline is reached before the search finishes.
+
+    """
+    if (rules, settings) not in _worker_evaluators:
+        options = dict(settings)
+        # Workers open the shared cache by name so every process searches with the same table
+        shared_cache = options.pop("shared_cache", None)
+        cache = None
+        if shared_cache is not None:
+            cache = SharedTranspositionTable(name=shared_cache)
+            # Workers exit without running atexit, so the table is closed by multiprocessing's exit handlers when the
+            # pool is shut down
+            util.Finalize(cache, cache.close, exitpriority=0)
+
+        _worker_evaluators[(rules, settings)] = Evaluator(Grid(*rules), "", depth, cache=cache, **options)
+
+    evaluator = _worker_evaluators[(rules, settings)]
+    evaluator.cache.generation = generation
+
+    evaluator._deadline = deadline
+    evaluator.stats = SearchStats(evaluator.num_columns, mask.bit_count())
+    try:
+        return evaluator.negamax(mask, position, depth, -MAX_SCORE, MAX_SCORE), evaluator.stats
+
+    finally:
+        evaluator._deadline = None
 
 
 class Strategy:
-    def __init__(self, grid: Grid, player_symbol: str, depth: int, select_p: float):
+    def __init__(self, grid: Grid, player_symbol: str, depth: int, select_p: float, time_limit=None, book=None,
+                 workers=None, options=None):
         """
         Initialize the strategy.
         Parameters
@@ -18,12 +242,37 @@ class Strategy:
             The depth to which the strategy should search
         select_p: float
             The probability that the strategy selects a move
+        time_limit: float | None
+            The number of seconds the strategy can spend on each move. If given, the strategy searches one move deeper
+            at a time until the time runs out or it reaches the depth.
+        book: OpeningBook | None
+            The opening book to check before searching. It is ignored if it was made for different rules.
+        workers: int | None
+            The number of worker processes to search with, or None to search in this process.
+        options: dict | None
+            Other keyword arguments for the evaluator, such as cache_size or killer_moves. They can include the number
+            of workers instead of passing it separately.
+
+        Raises
+        ------
+        ValueError
+            If the number of workers is given in the options and as an argument with different values.
         """
         self.symbol = player_symbol
         self.grid = grid
-        self.evaluator = Evaluator(grid, player_symbol, depth)
+        options = dict(options or {})
+        if "workers" in options:
+            if workers is not None and workers != options["workers"]:
+                raise ValueError("The number of workers is given twice with different values.")
+
+            workers = options.pop("workers")
+
+        self.evaluator = Evaluator(grid, player_symbol, depth, workers=workers, **options)
         self.ranked_indices = []
         self.select_p: float = select_p
+        self.time_limit = time_limit
+        self.book = book if book is not None and book.fits(grid) else None
+        self.last_stats = None  # The search counts of the last move
 
     def rank_moves(self):
         """
@@ -32,7 +281,11 @@ class Strategy:
 
         """
         self.evaluator.grid_to_int()
-        values = self.evaluator.calculate_move_values()
+        if self.time_limit is None:
+            values = self.evaluator.calculate_move_values()
+
+        else:
+            values = self.evaluator.iterative_deepening(self.time_limit)
         # We want moves with higher values to be ranked higher and then rank by depth.
 
         indexed_values = [(values[i][0], values[i][1], i) for i in range(len(values)) if not values[i] is None]
@@ -51,12 +304,46 @@ class Strategy:
 
     def move(self):
         """
-        Function for determining which move the computer chooses.
+        Function for determining which move the computer chooses. The search counts of the move are kept in
+        self.last_stats and logged, and the move is profiled if profiling is on.
         Returns
         -------
         The move the computer has made.
 
         """
+        self.evaluator.grid_to_int()
+        self.evaluator.reset_stats()
+        start = time.perf_counter()
+        # Moves made outside a game are numbered by the turn they are made on
+        with profile_move(None, self.evaluator.get_mask().bit_count() + 1, f"strategy-{self.symbol}"):
+            move = self.choose_move()
+
+        seconds = time.perf_counter() - start
+        self.last_stats = {"move": move, "seconds": seconds, **self.evaluator.stats.as_dict(),
+                           "nodes_per_second": self.evaluator.stats.nodes / seconds if seconds else 0.0}
+        logger.debug("Player %s chose %s: %s", self.symbol, move, self.last_stats)
+        return move
+
+    def choose_move(self):
+        """
+        Chooses a move from the book, or by searching if the book doesn't have one.
+        Returns
+        -------
+        int
+            The column of the move.
+
+        """
+        moves = self.evaluator.non_losing_moves()
+        # If only one move doesn't lose straight away there is no need to search
+        if len(moves) == 1 and random.random() < self.select_p:
+            return moves[0]
+
+        if self.book is not None:
+            book_move = self.book.lookup(self.evaluator.get_mask(), self.evaluator.get_position())
+            # The book only has the best move, so players who don't always choose the best move still search
+            if book_move is not None and random.random() < self.select_p:
+                return book_move[0]
+
         self.rank_moves()
 
         for move in self.ranked_indices:
@@ -67,7 +354,9 @@ class Strategy:
 
 
 class Evaluator:
-    def __init__(self, grid: Grid, player_symbol: str, depth: int):
+    def __init__(self, grid: Grid, player_symbol: str, depth: int, cache_size=None, replacement="depth",
+                 center_ordering=True, killer_moves=True, history_heuristic=True, symmetry=True, endgame_threshold=16,
+                 workers=None, cache=None):
         """
         Parameters
         ----------
@@ -78,49 +367,145 @@ class Evaluator:
 
         depth: int
             The depth it will evaluate to.
+        cache_size: int | None
+            The number of slots in the transposition table. If None the size is chosen from the depth.
+        replacement: str
+            The replacement policy of the transposition table, either "depth" or "always".
+        center_ordering: bool
+            Whether to search the middle columns before the outside columns.
+        killer_moves: bool
+            Whether to search moves that caused a cutoff elsewhere at the same ply first.
+        history_heuristic: bool
+            Whether to search moves that have caused the most cutoffs first.
+        symmetry: bool
+            Whether a grid and its mirror image share one cache entry.
+        endgame_threshold: int
+            When this many empty cells or fewer are left the search goes to the end of the game, so the values are
+            exact rather than estimates.
+        workers: int | None
+            The number of worker processes to search the moves from the root with. If None the moves are searched one
+            after another in this process.
+        cache: TranspositionTable | SharedTranspositionTable | None
+            The table to cache positions in, which can be shared with other evaluators. If None a new table is made
+            using the cache size and replacement policy.
+
+        Raises
+        ------
+        ValueError
+            If the cache is shared between processes and the keys of the grid don't fit in 64 bits.
 
         """
         self.grid = grid
         self.num_columns = self.grid.num_columns
         self.num_rows = self.grid.num_rows
         self.player_symbol = player_symbol
-        self.is_default = (self.num_columns == 7) and (self.num_rows == 6)
 
         self._position: int = 0
         self._mask: int = 0
         self._full_grid = self.calculate_full_grid()
+        self._bottom = self.calculate_bottom_row()
+        self._num_cells = self.num_rows * self.num_columns
+        self.win_num = self.grid.win_num
+        self._weight_planes = self.calculate_weight_planes()
+
+        # The shift to the next cell vertically, horizontally, diagonally / and diagonally \
+        self._directions = (1, self.num_rows + 1, self.num_rows, self.num_rows + 2)
+        self._win_shifts = self.calculate_run_shifts(self.win_num)
+        # Lines of 3 or 4 only need two shifts in each direction
+        self._win_pairs = None
+        if self.win_num in (3, 4):
+            self._win_pairs = (self.num_rows + 1,) + tuple(shifts[1] for shifts in self._win_shifts)
+        # The shifts to the next three cells in each direction apart from vertically
+        self._line_shifts = [(direction, 2 * direction, 3 * direction) for direction in self._directions[1:]]
+        # The cells of each column, not including the empty bit at the top
+        self._column_masks = [((1 << self.num_rows) - 1) << ((self.num_columns - 1 - column) * (self.num_rows + 1))
+                              for column in range(self.num_columns)]
         self._depth = depth
-
-        self.cache = defaultdict(lambda: (None, None))
+        self.completed_depth = 0  # The deepest search that finished during iterative deepening
+        self.endgame_threshold = endgame_threshold
+        self.solved = False  # Whether the last move values were searched to the end of the game
+
+        self._deadline = None  # The time at which a timed search has to stop
+        self.stats = SearchStats(self.num_columns)  # What the search has done since the stats were last reset
+
+        if cache_size is None:
+            # Worker processes are given the size, since their first search is shallower than this depth
+            cache_size = table_size(depth)
+
+        if cache is None:
+            cache = TranspositionTable(cache_size, replacement)
+
+        elif isinstance(cache, SharedTranspositionTable) and self.num_columns * (self.num_rows + 1) > 64:
+            raise ValueError("The grid is too large for a shared cache.")
+
+        self.cache = cache
+        self.symmetry = symmetry
+        # Each column is moved to the opposite side of the grid by shifting it the difference between the two shifts
+        self._mirror_shifts = [(column * (self.num_rows + 1), (self.num_columns - 1 - column) * (self.num_rows + 1))
+                               for column in range(self.num_columns)]
+        self._column_bits = (1 << (self.num_rows + 1)) - 1
+
+        self.center_ordering = center_ordering
+        self.killer_moves = killer_moves
+        self.history_heuristic = history_heuristic
+        self._move_order = self.calculate_move_order()
+        self._killers = []  # The two most recent moves that caused a cutoff at each ply
+        self._history = []  # How much each column has caused cutoffs, weighted by the depth of the cutoff
+        self.clear_move_ordering()
+
+        self.workers = workers
+        # Worker processes build their own evaluator from these, so it searches the same way as this one
+        self._rules = (self.num_rows, self.num_columns, self.win_num)
+        self._settings = (("cache_size", cache_size), ("replacement", replacement),
+                          ("center_ordering", center_ordering), ("killer_moves", killer_moves),
+                          ("history_heuristic", history_heuristic), ("symmetry", symmetry))
+        if isinstance(self.cache, SharedTranspositionTable):
+            self._settings += (("shared_cache", self.cache.name),)
 
         self.move_values: list = []
 
     def grid_to_int(self):
         """
-        Converts a grid object into position and mask numbers.
+        Gets the position and mask numbers of the grid object.
 
         """
-        position = ''
-        mask = ''
-        # The grid is represented with a position and a mask. To find the other position we can XOR the two
-        for column in range(self.num_columns):
-            mask += "0"
-            position += "0"
-            for row in range(self.num_rows - 1, -1, -1):
-                # We add to the mask if the cell is not empty
-                mask += ['0', '1'][not self.grid.cells[(row, column)].is_empty()]
-                # We add to the position if the cell has the desired symbol
-                position += ['0', '1'][self.grid.cells[(row, column)].symbol == self.player_symbol]
-
-        # Each column is represented with a binary number with a length of one more than the column height and the
-        # msb being 0.
-        # The grid is then represented with one binary number with the rightmost column being at the end
-        # of the number.
-
-        if self._position != int(position, 2) or self._mask != int(mask, 2):
-            self._position = int(position, 2)
-            self._mask = int(mask, 2)
+        # The grid keeps bitboards of its pieces in the same layout as the evaluator, so they don't need converting.
+        # To find the other position we can XOR the two.
+        self.set_position(self.grid.mask, self.grid.get_bitboard(self.player_symbol))
+
+    def set_position(self, mask: int, position: int):
+        """
+        Sets the mask and position to evaluate without using a grid.
+        Parameters
+        ----------
+        mask: int
+            The mask of the grid.
+        position: int
+            The position of the player whose turn it is.
+
+        """
+        if self._position != position or self._mask != mask:
+            self._position = position
+            self._mask = mask
             self.move_values = []
+            self.clear_move_ordering()
+            # Entries from searches of earlier grids are kept, but they are replaced before entries from this search
+            self.cache.new_generation()
+            self.reset_stats()
+
+    def reset_stats(self):
+        """
+        Starts counting the search from zero again, from the current grid.
+
+        Returns
+        -------
+        SearchStats
+            The counts since the last reset.
+
+        """
+        stats = self.stats
+        self.stats = SearchStats(self.num_columns, self._mask.bit_count())
+        return stats
 
     def get_position(self):
         """
@@ -144,13 +529,44 @@ class Evaluator:
         """
         return self._mask
 
-    def check_n_in_a_row(self, position: int, n=4):
+    def calculate_run_shifts(self, n: int):
+        """
+        Calculates the shifts needed to find n in a row in each direction. Each shift doubles the length of the lines
+        found so far, until the last shift which makes the length up to n.
+        Parameters
+        ----------
+        n: int
+            The number in a row.
+
+        Returns
+        -------
+        list[list[int]]
+            The shifts for each direction.
+
+        """
+        run_shifts = []
+        for direction in self._directions:
+            shifts = []
+            length = 1
+            while length * 2 <= n:
+                shifts.append(length * direction)
+                length *= 2
+
+            if length < n:
+                # The two lines overlap so together they are n long
+                shifts.append((n - length) * direction)
+
+            run_shifts.append(shifts)
+
+        return run_shifts
+
+    def check_n_in_a_row(self, position: int, n=None):
         """
         Checks if the current position contains an n in a row.
         Parameters
         ----------
         n: int
-            The number in a row we are checking.
+            The number in a row we are checking, defaults to the win number of the grid.
         position: int
             The position to check.
 
@@ -160,49 +576,117 @@ class Evaluator:
             Whether the current position contains an n in a row.
 
         """
-        base_shift = position >> self.num_rows + 1  # Same as a horizontal shift of 1
-        # This only works with four/three in a row.
-        # Horizontal
-        if n == 4:
-
-            shift = position & base_shift
-            if shift & (shift >> (self.num_rows * 2 + 2)):
+        if n is None and self._win_pairs is not None:
+            # This covers 3 and 4 in a row, and is written out in full since it is used at every node of the search
+            # The first shift of each diagonal is the horizontal shift moved by one row. The bit this loses is the
+            # empty bit at the top of a column so it doesn't change the result.
+            horizontal, vertical_2, horizontal_2, up_2, down_2 = self._win_pairs
+            base_shift = position >> horizontal
+            lines = position & base_shift
+            if lines & (lines >> horizontal_2):
                 return True
 
-            # Diagonal \
-            shift = position & (base_shift << 1)
-            if shift & (shift >> (self.num_rows * 2)):
+            lines = position & (base_shift << 1)
+            if lines & (lines >> up_2):
                 return True
 
-            # Diagonal /
-            shift = position & (base_shift >> 1)
-            if shift & (shift >> ((self.num_rows * 2) + 4)):
+            lines = position & (base_shift >> 1)
+            if lines & (lines >> down_2):
                 return True
 
-            # Vertical
-            shift = position & (position >> 1)
-            if shift & (shift >> 2):
-                return True
+            lines = position & (position >> 1)
+            return bool(lines & (lines >> vertical_2))
 
-        if n == 3:
-            shift = position & base_shift
-            if shift & (shift >> (self.num_rows + 1)):
-                return True
+        if n is None or n == self.win_num:
+            run_shifts = self._win_shifts
 
-            shift = position & (base_shift << 1)
-            if shift & (shift >> self.num_rows):
-                return True
+        else:
+            run_shifts = self.calculate_run_shifts(n)
 
-            shift = position & (base_shift >> 1)
-            if shift & (shift >> (self.num_rows + 2)):
-                return True
+        for shifts in run_shifts:
+            # After each shift a bit is only left if it is the start of a line as long as the total shift so far
+            lines = position
+            for shift in shifts:
+                lines &= lines >> shift
 
-            shift = position & (position >> 1)
-            if shift & (shift >> 1):
+            if lines:
                 return True
 
         return False
 
+    def winning_cells(self, position: int, mask: int):
+        """
+        Finds the empty cells which would give the player n in a row if they had a piece there.
+        Parameters
+        ----------
+        position: int
+            The position of the player.
+        mask: int
+            The mask of the grid.
+
+        Returns
+        -------
+        int
+            The cells as a bitboard.
+
+        """
+        length = self.win_num - 1
+        if length == 3:
+            # The general method below written out for 4 in a row, since it is used at every node of the search
+            cells = (position << 1) & (position << 2) & (position << 3)
+            for one, two, three in self._line_shifts:
+                pair = (position << one) & (position << two)
+                cells |= pair & (position << three)
+                cells |= pair & (position >> one)
+                pair = (position >> one) & (position >> two)
+                cells |= pair & (position << one)
+                cells |= pair & (position >> three)
+
+            return cells & (self._full_grid ^ mask)
+
+        # Vertical, the line can only be finished at the top
+        cells = -1
+        for distance in range(1, length + 1):
+            cells &= position << distance
+
+        for direction in self._directions[1:]:
+            # after[i] has the cells with i of the player's pieces directly after them in the direction
+            after = [-1]
+            before = [-1]
+            for distance in range(1, length + 1):
+                after.append(after[-1] & (position >> distance * direction))
+                before.append(before[-1] & (position << distance * direction))
+
+            # The empty cell can have any number of the pieces on either side of it
+            for number_after in range(length + 1):
+                cells |= after[number_after] & before[length - number_after]
+
+        return cells & (self._full_grid ^ mask)
+
+    def non_losing_moves(self):
+        """
+        Finds the moves from self._mask and self._position after which the opponent can't win straight away.
+        Returns
+        -------
+        list[int]
+            The columns of the moves.
+
+        """
+        candidates = (self._mask + self._bottom) & self._full_grid
+        own_wins = self.winning_cells(self._position, self._mask)
+        opponent_wins = self.winning_cells(self._position ^ self._mask, self._mask)
+        moves = []
+        for column in range(self.num_columns):
+            cell = candidates & self._column_masks[column]
+            if not cell:
+                continue
+
+            # After the move the opponent can play in any of the other columns or on top of the new piece
+            if cell & own_wins or not ((candidates ^ cell) | (cell << 1)) & opponent_wins:
+                moves.append(column)
+
+        return moves
+
     def make_move(self, mask: int, position: int, column: int):
         """
         Returns new position and mask based on the input position and mask.
@@ -244,117 +728,405 @@ class Evaluator:
         # Checking whether the top row of a column has a bit by doing an and with a bit in that column
         return bool(mask & (1 << (shift * (self.num_columns - column) - (row + 2))))
 
-    def minimax_alpha_beta(self, mask: int, position: int, is_max: bool, depth: int, alpha: float,
-                           beta: float):
+    def negamax(self, mask: int, position: int, depth: int, alpha: int, beta: int) -> int:
         """
-        Recursively checks the possible board from the current states and evaluates them.
+        Recursively searches the possible grids from the current state using negamax with principal variation search.
+        Scores are always from the point of view of the player whose turn it is.
         Parameters
         ----------
         mask: int
             The mask of the grid.
         position: int
-            The position of the grid.
-        is_max: int
-            Whether it is maximising or minimising.
+            The position of the grid, which is the pieces of the player whose turn it is.
         depth: int
             The depth to check up to.
-        alpha: float
-        beta: float
+        alpha: int
+            The score the player to move is already guaranteed.
+        beta: int
+            The score the opponent is already guaranteed.
 
         Returns
         -------
-        tuple
-            The value of the board and how far away it terminates.
+        int
+            The score of the grid. A win scores WIN_SCORE plus the number of empty cells left once it is made, so
+            faster wins score higher.
 
         """
-        if self.check_n_in_a_row(position ^ mask):  # Since we are receiving after the opposing player has made a
-            # move we can guarantee that wew don't have a 4-in-a-row
-            if is_max:
-                return -math.inf, 0
+        stats = self.stats
+        stats.nodes += 1
+        if self._deadline is not None and not stats.nodes & 1023 and time.perf_counter() > self._deadline:
+            raise SearchTimeout  # Only check the time every 1024 nodes since it is relatively slow
 
-            return math.inf, 0
+        ply = mask.bit_count()
+        if ply > stats.max_ply:
+            stats.max_ply = ply
+
+        if self.check_n_in_a_row(position ^ mask):  # The opponent has just made n in a row
+            stats.leaves += 1
+            return -(WIN_SCORE + self._num_cells - ply)
 
         if mask == self._full_grid:
-            return 0, 0  # If the grid is full we return 0 since that means it is a draw.
+            stats.leaves += 1
+            return 0  # If the grid is full we return 0 since that means it is a draw.
 
         if depth == 0:
-            return ((-1) ** (not is_max)) * (self.evaluate_grid(position) - self.evaluate_grid(position ^ mask)), 0
+            stats.leaves += 1
+            return self.evaluate_difference(mask, position)
+
+        candidates = (mask + self._bottom) & self._full_grid  # The cells a piece can be placed in
+        if candidates & self.winning_cells(position, mask):
+            stats.leaves += 1
+            return WIN_SCORE + self._num_cells - ply - 1  # We can win straight away so there is no need to search
+
+        opponent_wins = self.winning_cells(position ^ mask, mask)
+        forced_moves = candidates & opponent_wins
+        if forced_moves:
+            if forced_moves & (forced_moves - 1):
+                # The opponent can win in two places so we can only block one of them
+                stats.leaves += 1
+                return -(WIN_SCORE + self._num_cells - ply - 2)
+
+            candidates = forced_moves  # Any other move lets the opponent win
+
+        # Playing directly below a cell the opponent can win in lets them play there
+        candidates &= ~(opponent_wins >> 1)
+        if not candidates:
+            stats.leaves += 1
+            return -(WIN_SCORE + self._num_cells - ply - 2)
+
+        alpha_original = alpha
+        key = position + mask + self._bottom
+        mirrored = False
+        if self.symmetry:
+            # A grid and its mirror image have the same value so we only store the one with the smaller key
+            mirror_key = self.mirror(key)
+            if mirror_key < key:
+                key = mirror_key
+                mirrored = True
+
+        stats.cache_probes += 1
+        cached_value = self.cache.probe(key)
+        cached_move = None
+        if cached_value is not None:
+            stats.cache_hits += 1
+            cached_move = cached_value[4]
+
+        if mirrored and cached_move is not None:
+            cached_move = self.num_columns - 1 - cached_move
+
+        if cached_value is not None and cached_value[2] >= depth:
+            # The stored value may only be a bound, in which case we can only use it to narrow the window
+            value, bound = cached_value[1], cached_value[3]
+            if bound == EXACT:
+                return value
+
+            elif bound == LOWER:
+                alpha = max(alpha, value)
+
+            elif bound == UPPER:
+                beta = min(beta, value)
+
+            if beta <= alpha:
+                return value
+
+        columns = [column for column in self._move_order if candidates & self._column_masks[column]]
+        if self.history_heuristic:
+            # Sorting is stable, so columns with the same history stay in the static order
+            columns.sort(key=self._history.__getitem__, reverse=True)
+
+        if self.killer_moves:
+            for killer in reversed(self._killers[ply]):
+                if killer is not None and killer in columns:
+                    columns.remove(killer)
+                    columns.insert(0, killer)
+
+        if cached_move is not None and cached_move in columns:
+            # The best move from an earlier, shallower search is likely to still be good so we try it first
+            columns.remove(cached_move)
+            columns.insert(0, cached_move)
+
+        best = -MAX_SCORE
+        best_move = columns[0]
+        for index, column in enumerate(columns):
+            new_mask, new_position, _ = self.make_move(mask, position, column)
+            if index == 0:
+                score = -self.negamax(new_mask, new_position, depth - 1, -beta, -alpha)
 
-        next_states = []
-        for column in range(self.num_columns):
-            # Find all possible states that aren't full. May be more efficient to do this part in 1 loop with the rest.
-            if not self.check_bit(mask, column, 0):
-                next_states.append(self.make_move(mask, position, column))
+            else:
+                # We expect the first move to be the best, so we only check whether this move is better than alpha
+                score = -self.negamax(new_mask, new_position, depth - 1, -alpha - 1, -alpha)
+                if alpha < score < beta:
+                    # It was better so we need to search again to find its actual score
+                    score = -self.negamax(new_mask, new_position, depth - 1, -beta, -score)
+
+            if score > best:
+                best = score
+                best_move = column
+
+            if best > alpha:
+                alpha = best
+
+            if alpha >= beta:
+                stats.cutoffs += 1
+                stats.cutoff_indices[index] += 1
+                # This move is good enough that it is likely to cause cutoffs in similar positions
+                killers = self._killers[ply]
+                if killers[0] != column:
+                    killers[1] = killers[0]
+                    killers[0] = column
+
+                self._history[column] += depth * depth
+                break
+
+        # Values outside the original window are only bounds on the true value of the position
+        if best <= alpha_original:
+            bound = UPPER
+
+        elif best >= beta:
+            bound = LOWER
 
-        if is_max:
-            best = -math.inf
         else:
-            best = math.inf
+            bound = EXACT
 
-        current_length = 0
-        for state in next_states:
-            cached_value = self.get_cache(state[0], state[1], depth - 1)
-            if cached_value is False:
-                val_length = self.minimax_alpha_beta(state[0], state[1], not is_max, depth - 1, alpha, beta)
-                val = val_length[0]
-                length = val_length[1]
+        stats.cache_stores += 1
+        self.cache.store(key, best, depth, bound, self.num_columns - 1 - best_move if mirrored else best_move)
+        return best
 
-                self.set_cache(state[0], state[1], (-1) ** (not is_max) * cached_value, length)
-
-            else:
-                val = cached_value[0]
-                length = cached_value[1]
+    def score_to_value(self, score: int, mask: int, depth=None):
+        """
+        Converts a score from negamax into a value and how many moves away the game ends.
+        Parameters
+        ----------
+        score: int
+            The score of the grid.
+        mask: int
+            The mask of the grid.
+        depth: int
+            The depth of the search, defaults to the depth of the evaluator.
 
-            if is_max:
-                if val > best:  # If we find a new best value we change best and also change the length.
-                    best = val
-                    current_length = length  # The minimax algorithm doesn't care about the length, useful for strategy.
-                alpha = max(best, alpha)
-                if beta <= alpha:
-                    return alpha, current_length + 1  # We increase the length the end is away by one.
+        Returns
+        -------
+        tuple
+            The value of the grid, which is infinite if it is a win or loss, and how many moves away the game ends.
+            If the game doesn't end within the search the length is the depth of the search.
 
-            else:
-                if val < best:
-                    best = val
-                    current_length = length
-                beta = min(best, beta)
-                if beta <= alpha:
-                    return beta, current_length + 1
+        """
+        if abs(score) < WIN_SCORE:
+            return score, self._depth if depth is None else depth
 
-        return best, current_length + 1
+        length = WIN_SCORE + self._num_cells - abs(score) - mask.bit_count()
+        return math.inf if score > 0 else -math.inf, length
 
-    def calculate_move_values(self) -> list:
+    def calculate_move_values(self, depth=None, endgame=True) -> list:
         """
-        Calculates the value of all possible moves from the position and mask.
+        Calculates the value of all possible moves from the position and mask. If the values have already been
+        calculated they are returned without searching again.
+        Parameters
+        ----------
+        depth: int
+            The depth to search to, defaults to the depth of the evaluator.
+        endgame: bool
+            Whether to search to the end of the game once there are endgame_threshold empty cells or fewer.
+
         Returns
         -------
         list
-            The value of a move at each of the different columns.
+            The value of a move at each of the different columns. If self.solved is True every value is exact, so a
+            value of 0 is a draw rather than an estimate.
 
         """
+        if depth is None:
+            depth = self._depth
+
+        empty_cells = self._num_cells - self._mask.bit_count()
+        if endgame and empty_cells <= self.endgame_threshold:
+            # There are few enough moves left that we can search to the end of the game
+            depth = max(depth, empty_cells)
+
+        # If the grid is the same as its mirror image then each move has the same value as its mirrored move
+        key = self.position_key(self._mask, self._position)
+        symmetric = self.symmetry and self.mirror(key) == key
+
         if not self.move_values:
+            # The moves are searched one deeper than the depth, so this is enough to reach a full grid
+            self.solved = depth >= empty_cells - 1
+            scores = {}
+            if self.workers is not None and self.workers > 1:
+                scores = self.parallel_scores(depth, symmetric)
+
             for column in range(self.num_columns):
                 if self.check_bit(self._mask, column, 0):
                     self.move_values.append(None)  # We really don't want anything selecting a column that is too full
 
+                elif symmetric and column > (self.num_columns - 1) / 2:
+                    self.move_values.append(self.move_values[self.num_columns - 1 - column])
+
                 else:
                     move = self.make_move(self._mask, self._position, column)
-                    self.move_values.append(self.minimax_alpha_beta(move[0], move[1], False, self._depth,
-                                                                    -math.inf, math.inf))
+                    if column in scores:
+                        score = scores[column]
+
+                    else:
+                        score = -self.negamax(move[0], move[1], depth, -MAX_SCORE, MAX_SCORE)
+
+                    self.move_values.append(self.score_to_value(score, move[0], depth))
+
+        return self.move_values
+
+    def parallel_scores(self, depth: int, symmetric: bool) -> dict:
+        """
+        Searches each move from the root in the worker pool at the same time.
+        Parameters
+        ----------
+        depth: int
+            The depth to search each move to.
+        symmetric: bool
+            Whether the grid is the same as its mirror image, in which case only the left half is searched.
+
+        Returns
+        -------
+        dict
+            The score of each searched column.
+
+        Raises
+        ------
+        SearchTimeout
+            If the deadline is reached before every move has been searched.
+
+        """
+        pool = get_pool(self.workers)
+        futures = {}
+        # The middle columns are usually the slowest to search so they are started first
+        for column in self._move_order:
+            if self.check_bit(self._mask, column, 0) or (symmetric and column > (self.num_columns - 1) / 2):
+                continue
+
+            mask, position, _ = self.make_move(self._mask, self._position, column)
+            futures[column] = pool.submit(search_move, self._rules, self._settings, mask, position, depth,
+                                          self._deadline, self.cache.generation)
+
+        try:
+            scores = {}
+            for column, future in futures.items():
+                score, stats = future.result()
+                scores[column] = -score
+                self.stats.merge(stats)
+
+            return scores
+
+        except SearchTimeout:
+            for future in futures.values():
+                future.cancel()
+
+            raise
+
 
+    def iterative_deepening(self, time_limit: float, max_depth=None) -> list:
+        """
+        Calculates the value of all possible moves, searching to depth 1, 2, 3... until the time runs out.
+        Every search stores its best moves in the cache, which the next search uses to try the best moves first.
+        If there is still time after the deepest search and the grid has endgame_threshold empty cells or fewer, the
+        last search goes to the end of the game.
+        Parameters
+        ----------
+        time_limit: float
+            The number of seconds the search can take. The depth 1 search always finishes.
+        max_depth: int
+            The deepest search to make, defaults to the depth of the evaluator.
+
+        Returns
+        -------
+        list
+            The value of a move at each of the different columns from the deepest search that finished.
+
+        """
+        if max_depth is None:
+            max_depth = self._depth
+
+        deadline = time.perf_counter() + time_limit
+        best_values = []
+        solved = False
+        self.completed_depth = 0
+        empty_cells = self._num_cells - self._mask.bit_count()
+        for depth in range(1, max_depth + 2):
+            # Searches to the end of the game are left until last, so they are always made with a deadline
+            endgame = depth > max_depth
+            if endgame and empty_cells > self.endgame_threshold:
+                break
+
+            self.move_values = []
+            try:
+                self.calculate_move_values(min(depth, max_depth), endgame)
+
+            except SearchTimeout:
+                break
+
+            self._deadline = deadline  # Only the first search is allowed to run over time
+            best_values = self.move_values
+            solved = self.solved
+            self.completed_depth = max(max_depth, empty_cells) if endgame else depth
+            if any(value is not None and value[0] == math.inf for value in best_values):
+                break  # A shallower search always finds the fastest win first so this is the best move
+
+            if all(value is None or value[0] == -math.inf for value in best_values):
+                break  # Every move loses so searching deeper won't change anything
+
+            if solved:
+                break  # The search reached the end of the game so the values are exact
+
+            if time.perf_counter() > deadline:
+                break
+
+        self._deadline = None
+        self.move_values = best_values
+        self.solved = solved
         return self.move_values
 
     def evaluate_self(self):
         """
-        Runs the minimax algorithm on the values stored in self._mask and self._position
+        Runs the negamax algorithm on the values stored in self._mask and self._position
         Returns
         -------
-        float:
-            The value of the grid described by self._mask and self._position.
+        tuple:
+            The value of the grid described by self._mask and self._position and how many moves away the game ends.
+
+        """
+        score = self.negamax(self._mask, self._position, self._depth, -MAX_SCORE, MAX_SCORE)
+        return self.score_to_value(score, self._mask)
 
+    def search_root(self, mask: int, position: int, depth: int):
         """
+        Searches a grid and finds its best move. The cache can't be relied on for the move, because grids with a win
+        or a forced loss are scored without being stored.
+        Parameters
+        ----------
+        mask: int
+            The mask of the grid.
+        position: int
+            The position of the player whose turn it is.
+        depth: int
+            The depth to search to, counting the move from this grid.
 
-        return self.minimax_alpha_beta(self._mask, self._position, True, self._depth, -math.inf, math.inf)
+        Returns
+        -------
+        tuple[int, int]
+            The score of the grid and the column of its best move.
+
+        """
+        best = -MAX_SCORE
+        best_move = None
+        for column in self._move_order:
+            if self.check_bit(mask, column, 0):
+                continue
+
+            new_mask, new_position, _ = self.make_move(mask, position, column)
+            # Moves that can't beat the best move so far only need to be shown to be no better
+            score = -self.negamax(new_mask, new_position, depth - 1, -MAX_SCORE, -best)
+            if score > best:
+                best = score
+                best_move = column
+
+        return best, best_move
 
     def calculate_full_grid(self):
         """
@@ -369,9 +1141,136 @@ class Evaluator:
         grid_str = "".join("".join(row) for row in grid_list)
         return int(grid_str, 2)
 
-    def get_cache(self, mask, pos, depth):
+    def calculate_move_order(self):
+        """
+        Calculates the order the columns are searched in. Moves in the middle are usually better since they are part
+        of more possible lines.
+        Returns
+        -------
+        list[int]
+            The columns from the middle outwards if center ordering is used, otherwise from left to right.
+
+        """
+        if not self.center_ordering:
+            return list(range(self.num_columns))
+
+        # Sorting is stable so the left column of a pair the same distance from the middle comes first
+        return sorted(range(self.num_columns), key=lambda column: abs(2 * column - (self.num_columns - 1)))
+
+    def clear_move_ordering(self):
+        """
+        Clears the killer moves and history, which are only useful for searches from the same grid.
+
+        """
+        self._killers = [[None, None] for _ in range(self._num_cells + 1)]
+        self._history = [0] * self.num_columns
+
+    def calculate_bottom_row(self):
+        """
+        Calculates the integer with only the bottom row of the grid filled.
+        Returns
+        -------
+        int
+            The integer value of the bottom row
+
+        """
+        return sum(1 << (column * (self.num_rows + 1)) for column in range(self.num_columns))
+
+    def position_key(self, mask: int, pos: int):
+        """
+        Packs a mask and position into a single integer which is unique to the grid.
+        Adding the bottom row to the mask sets the bit above the highest piece in every column, so the bits below it
+        are the position. This means the key has the same number of bits as the mask.
+        Parameters
+        ----------
+        mask: int
+            the mask of the grid
+        pos: int
+            the pos of the grid
+
+        Returns
+        -------
+        int
+            The key of the grid
+
+        """
+        return pos + mask + self._bottom
+
+    def unpack_key(self, key: int):
         """
-        Returns the cached value for the mask and position if one exists and returns False if it doesn't
+        Converts a key made by position_key back into a mask and position.
+        Parameters
+        ----------
+        key: int
+            The key of the grid.
+
+        Returns
+        -------
+        tuple[int, int]
+            The mask and position of the grid.
+
+        """
+        mask = 0
+        pos = 0
+        column_bits = (1 << (self.num_rows + 1)) - 1
+        for column in range(self.num_columns):
+            shift = column * (self.num_rows + 1)
+            column_key = (key >> shift) & column_bits
+            height_bit = 1 << (column_key.bit_length() - 1)  # The highest bit marks the top of the column
+            mask |= (height_bit - 1) << shift
+            pos |= (column_key ^ height_bit) << shift
+
+        return mask, pos
+
+    def mirror(self, grid_int: int):
+        """
+        Reflects a position, mask or key from left to right.
+        Parameters
+        ----------
+        grid_int: int
+            The integer to reflect.
+
+        Returns
+        -------
+        int
+            The mirror image of the integer.
+
+        """
+        mirrored = 0
+        column_bits = self._column_bits
+        for shift, mirror_shift in self._mirror_shifts:
+            mirrored |= ((grid_int >> shift) & column_bits) << mirror_shift
+
+        return mirrored
+
+    def cache_key(self, mask: int, pos: int):
+        """
+        Finds the key a grid is stored under in the cache. If symmetry is used this is the smaller of the keys of the
+        grid and its mirror image.
+        Parameters
+        ----------
+        mask: int
+            the mask of the grid
+        pos: int
+            the pos of the grid
+
+        Returns
+        -------
+        tuple[int, bool]
+            The key and whether it is the key of the mirror image.
+
+        """
+        key = pos + mask + self._bottom
+        if self.symmetry:
+            mirror_key = self.mirror(key)
+            if mirror_key < key:
+                return mirror_key, True
+
+        return key, False
+
+    def get_cache(self, mask: int, pos: int, depth: int):
+        """
+        Returns the cached entry for the mask and position if one exists that was searched deep enough.
         Parameters
         ----------
         mask: int
@@ -383,20 +1282,22 @@ class Evaluator:
 
         Returns
         -------
-        list[int]
-            The cached value stored
+        tuple | None
+            The cached entry (key, value, depth, bound, move, generation), or None if there is no usable entry.
 
         """
-        cached_value = self.cache[(mask, pos)]
-        if self.cache[(mask, pos)][0] is None:
-            return False  # If it does not exist then return False
+        key, mirrored = self.cache_key(mask, pos)
+        cached_value = self.cache.probe(key)
+        if cached_value is None or cached_value[2] < depth:
+            return None  # If the stored depth is less than the desired then we should do the search again
 
-        elif cached_value[1] < depth:
-            return False  # If the stored depth is less than the desired then we should do the search again
+        if mirrored and cached_value[4] is not None:
+            # The move was stored for the mirror image of the grid
+            return cached_value[:4] + (self.num_columns - 1 - cached_value[4],) + cached_value[5:]
 
         return cached_value
 
-    def set_cache(self, mask: int, pos: int, value: int, depth: int):
+    def set_cache(self, mask: int, pos: int, value, depth: int, bound=EXACT, move=None):
         """
         Sets the value of the cache based off the mask and position
         Parameters
@@ -409,9 +1310,56 @@ class Evaluator:
             the calculated value for the grid
         depth: int
             the depth of the search
+        bound: int
+            whether the value is exact or a lower or upper bound
+        move: int
+            the best move found from the grid
+
+        """
+        key, mirrored = self.cache_key(mask, pos)
+        if mirrored and move is not None:
+            move = self.num_columns - 1 - move
+
+        self.cache.store(key, value, depth, bound, move)
+
+    def calculate_weights(self):
+        """
+        Gets the weight of each cell for the heuristic, which is the number of lines of n cells it is part of.
+        Returns
+        -------
+        list[list[int]]
+            The weight of each cell, with the top row first.
+
+        """
+        return line_weights(self.num_rows, self.num_columns, self.win_num)
 
+    def calculate_weight_planes(self):
         """
-        self.cache[(mask, pos)] = (value, depth)
+        Splits the weights into bit planes. Plane k has the cells whose weight has bit k set, so the total weight of a
+        position is the sum of the number of its bits in each plane shifted left by k.
+        The planes are shared by every evaluator with the same rules.
+        Returns
+        -------
+        list[tuple[int, int]]
+            The shift and the bitboard of each plane.
+
+        """
+        rules = (self.num_rows, self.num_columns, self.win_num)
+        if rules not in _weight_planes:
+            weights = self.calculate_weights()
+            planes = []
+            for shift in range(max(max(row) for row in weights).bit_length()):
+                plane = 0
+                for column in range(self.num_columns):
+                    for row in range(self.num_rows):
+                        if weights[row][column] >> shift & 1:
+                            plane |= 1 << ((self.num_rows + 1) * (self.num_columns - column) - (row + 2))
+
+                planes.append((shift, plane))
+
+            _weight_planes[rules] = planes
+
+        return _weight_planes[rules]
 
     def evaluate_grid(self, position):
         """
@@ -427,23 +1375,34 @@ class Evaluator:
             the estimate for the value of the grid
 
         """
-        if not self.is_default:
-            # If it is not a 7x6 grid return 0 as a heuristic will not be used
-            return 0
-        weights = [[3, 4, 5, 7, 5, 4, 3],
-                   [4, 6, 8, 10, 8, 6, 4],
-                   [5, 8, 11, 13, 11, 8, 5],
-                   [5, 8, 11, 13, 11,  8, 5],
-                   [4, 6, 8, 10, 8, 6, 4],
-                   [3, 4, 5, 7, 5, 4, 3]]
-
         total = 0
-        for column in range(7):
-            for row in range(6):
-                total += weights[row][column] * self.check_bit(position, column, row)
+        for shift, plane in self._weight_planes:
+            total += (position & plane).bit_count() << shift
 
         return total
 
+    def evaluate_difference(self, mask: int, position: int):
+        """
+        Evaluates how much better the grid is for the player whose turn it is than for their opponent.
+        Parameters
+        ----------
+        mask: int
+            The mask of the grid.
+        position: int
+            The position of the player whose turn it is.
+
+        Returns
+        -------
+        int:
+            the estimate for the value of the grid
+
+        """
+        opponent = position ^ mask
+        total = 0
+        for shift, plane in self._weight_planes:
+            total += ((position & plane).bit_count() - (opponent & plane).bit_count()) << shift
+
+        return total
 
     def __repr__(self):
         return f"Evaluator({self.grid=}, {self.player_symbol=})"
@@ -0,0 +1,202 @@
+# Plays games between two computer player configurations without any output. Run this file directly to compare the
+# default configurations.
+from main_project.back_end import Game
+from main_project.connect4_grid import CompactGrid
+from main_project.connect_4_cli import NullInterface
+from main_project.opening_book import load_book
+from main_project.strategy import get_pool
+import math
+import random
+import time
+
+# The settings of a computer player in a tournament. Options are passed to the evaluator.
+DEFAULT_CONFIG = {"depth": 6, "select_p": 1.0, "time_limit": None, "book": True, "options": {}}
+
+
+class TimingInterface(NullInterface):
+    def __init__(self):
+        """
+        An interface which doesn't show anything but records how long each move takes and who won.
+
+        """
+        super().__init__()
+        self.move_times: dict = {}  # The number of seconds each move took, with the player's name as the key
+        self.winner = None
+        self._start = None
+
+    def computer_thinking(self, player):
+        self._start = time.perf_counter()
+
+    def display_move(self, move: int):
+        self.move_times.setdefault(self.game.current_player.name, []).append(time.perf_counter() - self._start)
+
+    def display_win(self, player):
+        self.winner = player.name
+
+
+def make_config(**settings):
+    """
+    Makes a player configuration, using the default for any setting which isn't given.
+    Parameters
+    ----------
+    settings
+        The depth, select_p, time_limit, book and options of the player.
+
+    Returns
+    -------
+    dict
+        The configuration.
+
+    Raises
+    ------
+    ValueError
+        If a setting isn't recognised.
+
+    """
+    for name in settings:
+        if name not in DEFAULT_CONFIG:
+            raise ValueError(f"Unknown setting: {name}.")
+
+    return {**DEFAULT_CONFIG, **settings}
+
+
+def play_game(config_a: dict, config_b: dict, a_first: bool, seed: int, rules=(6, 7, 4)):
+    """
+    Plays one game between two configurations. This is run in the worker processes.
+    Parameters
+    ----------
+    config_a: dict
+        The configuration of player A.
+    config_b: dict
+        The configuration of player B.
+    a_first: bool
+        Whether player A makes the first move.
+    seed: int
+        The seed for the random choices the players make.
+    rules: tuple[int, int, int]
+        The number of rows, number of columns and win number of the grid.
+
+    Returns
+    -------
+    dict
+        The winner ("A", "B" or None for a draw), the number of moves, the number of seconds the game took and the
+        time each player took for each move.
+
+    """
+    random.seed(seed)
+    interface = TimingInterface()
+    game = Game(interface, *rules, grid_class=CompactGrid)
+    interface.game = game
+    order = [("A", config_a), ("B", config_b)] if a_first else [("B", config_b), ("A", config_a)]
+    for (name, config), symbol in zip(order, ["R", "B"]):
+        # The configuration replaces every setting the difficulty would choose
+        game.add_computer_player(name, 5, symbol, strategy_settings={
+            "depth": config["depth"], "select_p": config["select_p"], "time_limit": config["time_limit"],
+            "book": load_book() if config["book"] else None, "options": config["options"]})
+
+    start = time.perf_counter()
+    game.play_game()
+    return {"winner": interface.winner, "moves": game.turn_num - 1, "seconds": time.perf_counter() - start,
+            "move_times": interface.move_times}
+
+
+def wilson_interval(successes: int, trials: int, z=1.96):
+    """
+    Finds a confidence interval for a proportion, which stays between 0 and 1 even for small numbers of trials.
+    Parameters
+    ----------
+    successes: int
+        The number of successes.
+    trials: int
+        The number of trials.
+    z: float
+        The number of standard deviations wide the interval is, 1.96 for 95%.
+
+    Returns
+    -------
+    tuple[float, float]
+        The lower and upper bounds of the interval.
+
+    """
+    if trials == 0:
+        return 0.0, 1.0
+
+    proportion = successes / trials
+    centre = (proportion + z * z / (2 * trials)) / (1 + z * z / trials)
+    half_width = z * math.sqrt(proportion * (1 - proportion) / trials + z * z / (4 * trials * trials)) / (
+            1 + z * z / trials)
+    return max(0.0, centre - half_width), min(1.0, centre + half_width)
+
+
+def run_tournament(config_a: dict, config_b: dict, games=100, workers=None, rules=(6, 7, 4), seed=0):
+    """
+    Plays games between two configurations, swapping which one goes first each game.
+    Parameters
+    ----------
+    config_a: dict
+        The configuration of player A.
+    config_b: dict
+        The configuration of player B.
+    games: int
+        The number of games to play.
+    workers: int | None
+        The number of worker processes to play games in, or None to play them in this process.
+    rules: tuple[int, int, int]
+        The number of rows, number of columns and win number of the grid.
+    seed: int
+        The seed of the first game, each game after it uses the next seed.
+
+    Returns
+    -------
+    dict
+        The results of every game and a summary of the tournament.
+
+    """
+    arguments = [(config_a, config_b, game % 2 == 0, seed + game, rules) for game in range(games)]
+    start = time.perf_counter()
+    if workers is None:
+        results = [play_game(*game_arguments) for game_arguments in arguments]
+
+    else:
+        pool = get_pool(workers)
+        results = [future.result() for future in [pool.submit(play_game, *game_arguments)
+                                                  for game_arguments in arguments]]
+
+    return {"games": results, "summary": summarise(results, time.perf_counter() - start)}
+
+
+def summarise(results: list, seconds: float):
+    """
+    Summarises the results of a tournament.
+    Parameters
+    ----------
+    results: list[dict]
+        The results of each game from play_game.
+    seconds: float
+        The number of seconds the tournament took.
+
+    Returns
+    -------
+    dict
+        The win and draw rates with 95% confidence intervals, the number of games per second and the mean and
+        longest move times of each player.
+
+    """
+    summary = {"games": len(results), "games_per_second": len(results) / seconds if seconds else math.inf}
+    outcomes = {"A_win_rate": "A", "B_win_rate": "B", "draw_rate": None}
+    for name, winner in outcomes.items():
+        count = sum(1 for result in results if result["winner"] == winner)
+        summary[name] = (count / len(results) if results else 0.0, wilson_interval(count, len(results)))
+
+    for player in ("A", "B"):
+        move_times = [move_time for result in results for move_time in result["move_times"].get(player, [])]
+        summary[f"{player}_mean_move_seconds"] = sum(move_times) / len(move_times) if move_times else 0.0
+        summary[f"{player}_max_move_seconds"] = max(move_times, default=0.0)
+
+    return summary
+
+
+if __name__ == "__main__":
+    tournament = run_tournament(make_config(depth=6), make_config(depth=2, select_p=0.9), games=20)
+    for name, value in tournament["summary"].items():
+        print(f"{name}: {value}")
@@ -0,0 +1,629 @@
+from array import array
+from multiprocessing import resource_tracker, shared_memory
+import sys
+
+EXACT = 0  # The stored value is the true value of the position
+LOWER = 1  # The search failed high, the true value is at least the stored value
+UPPER = 2  # The search failed low, the true value is at most the stored value
+
+REPLACEMENT_POLICIES = ("depth", "always")
+
+# Keys are packed bitboards so the low bits only describe the rightmost columns. Using a prime number of slots means
+# every bit of the key affects which slot it is stored in.
+DEFAULT_SIZE = 1048573  # The largest prime below 2 ** 20
+MIN_SIZE = 4093  # The largest prime below 2 ** 12
+
+WORD_BYTES = 8
+VALUE_OFFSET = 1 << 31  # Added to values so they can be stored in 32 unsigned bits
+GENERATION_MASK = (1 << 56) - 1  # The bits of a packed entry below the generation
+
+
+def pack_entry(value: int, depth: int, bound: int, move=None, generation=0):
+    """
+    Packs an entry into one word. The value uses the lowest 32 bits, then the depth, bound, move and generation use a
+    byte each. The move is stored plus one so 0 means there is no move. Depths over 255 are stored as 255, which only
+    means the entry is used by fewer searches.
+    Parameters
+    ----------
+    value: int
+        The value found by the search.
+    depth: int
+        The remaining depth the position was searched to.
+    bound: int
+        Whether the value is EXACT, a LOWER bound or an UPPER bound.
+    move: int | None
+        The best move found from the position.
+    generation: int
+        The generation the entry was stored in.
+
+    Returns
+    -------
+    int
+        The packed entry.
+
+    Raises
+    ------
+    ValueError
+        If the value doesn't fit in 32 bits or the move doesn't fit in a byte.
+
+    """
+    if not -VALUE_OFFSET <= value < VALUE_OFFSET:
+        raise ValueError(f"The value {value} doesn't fit in a table entry.")
+
+    if move is not None and not 0 <= move < 255:
+        raise ValueError(f"The move {move} doesn't fit in a table entry.")
+
+    return ((value + VALUE_OFFSET) | min(depth, 255) << 32 | bound << 40 | (0 if move is None else move + 1) << 48
+            | (generation & 0xFF) << 56)
+
+
+def unpack_entry(data: int):
+    """
+    Unpacks a word made by pack_entry.
+    Parameters
+    ----------
+    data: int
+        The packed entry.
+
+    Returns
+    -------
+    tuple
+        The value, depth, bound, move and generation.
+
+    """
+    move = (data >> 48) & 0xFF
+    return ((data & 0xFFFFFFFF) - VALUE_OFFSET, (data >> 32) & 0xFF, (data >> 40) & 0xFF,
+            None if move == 0 else move - 1, data >> 56)
+
+
+def prime_below(number: int):
+    """
+    Finds the largest prime number below a number.
+    Parameters
+    ----------
+    number: int
+        The number, which has to be more than 2.
+
+    Returns
+    -------
+    int
+        The prime number.
+
+    """
+    candidate = number - 1
+    while any(candidate % divisor == 0 for divisor in range(2, int(candidate ** 0.5) + 1)):
+        candidate -= 1
+
+    return candidate
+
+
+def table_size(depth: int):
+    """
+    Chooses the number of slots for a table used by searches to a depth. Each extra ply roughly doubles the number of
+    positions a search stores, so the table starts at MIN_SIZE and doubles with each ply past 6, up to DEFAULT_SIZE.
+    Parameters
+    ----------
+    depth: int
+        The depth the table will be searched to.
+
+    Returns
+    -------
+    int
+        The number of slots, a prime number.
+
+    """
+    bits = min(max(depth + 6, MIN_SIZE.bit_length()), DEFAULT_SIZE.bit_length())
+    return prime_below(1 << bits)
+
+
+class TranspositionTable:
+    def __init__(self, size=DEFAULT_SIZE, replacement="depth"):
+        """
+        A fixed capacity table of previously searched positions. Each entry is packed into one word by pack_entry, and
+        the keys and entries are kept in two arrays, so a slot takes 16 bytes whether or not it is used.
+        Parameters
+        ----------
+        size: int
+            The number of slots in the table, ideally a prime number.
+        replacement: str
+            The replacement policy used when two positions share a slot. "depth" keeps whichever entry was searched
+            deeper and "always" replaces the old entry with the new one.
+
+        Raises
+        ------
+        ValueError
+            If the size is not positive or the replacement policy is not recognised.
+
+        """
+        if size < 1:
+            raise ValueError("Transposition table size must be positive.")
+
+        if replacement not in REPLACEMENT_POLICIES:
+            raise ValueError(f"Unknown replacement policy: {replacement}.")
+
+        self.size = size
+        self.replacement = replacement
+
+        # An entry of 0 is an empty slot. Keys of grids larger than 64 bits don't fit in the array, so the keys are
+        # moved to a list the first time one of them is stored
+        self.keys = array("Q", bytes(WORD_BYTES * size))
+        self.data = array("Q", bytes(WORD_BYTES * size))
+        self.stored = 0  # The number of occupied slots
+        # Increased for each new search, entries from earlier searches are replaced before entries from this one
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def index(self, key):
+        """
+        Finds the slot a key is stored in.
+        Parameters
+        ----------
+        key
+            The key of the position.
+
+        Returns
+        -------
+        int
+            The index of the slot.
+
+        """
+        return hash(key) % self.size
+
+    def probe(self, key):
+        """
+        Looks up a position in the table. A probe never adds anything to the table.
+        Parameters
+        ----------
+        key
+            The key of the position.
+
+        Returns
+        -------
+        tuple | None
+            The entry (key, value, depth, bound, move, generation) if the position is stored, otherwise None.
+
+        """
+        index = hash(key) % self.size
+        data = self.data[index]
+        if not data or self.keys[index] != key:
+            if data:
+                # The slot is being used by a different position
+                self.collisions += 1
+
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        generation = self.generation
+        if data >> 56 != generation:
+            # The entry is being used by this search, so it shouldn't be replaced before entries which aren't
+            data = data & GENERATION_MASK | generation << 56
+            self.data[index] = data
+
+        # Unpacked here rather than with unpack_entry since probes are made for most nodes of a search
+        move = (data >> 48) & 0xFF
+        return (key, (data & 0xFFFFFFFF) - VALUE_OFFSET, (data >> 32) & 0xFF, (data >> 40) & 0xFF,
+                move - 1 if move else None, generation)
+
+    def store(self, key, value: int, depth: int, bound: int, move=None):
+        """
+        Stores a position in the table, following the replacement policy if the slot is already in use.
+        Parameters
+        ----------
+        key: int
+            The key of the position.
+        value: int
+            The value found by the search.
+        depth: int
+            The remaining depth the position was searched to.
+        bound: int
+            Whether the value is EXACT, a LOWER bound or an UPPER bound.
+        move: int
+            The best move found from the position.
+
+        Returns
+        -------
+        bool
+            Whether the entry was stored.
+
+        Raises
+        ------
+        ValueError
+            If the value doesn't fit in 32 bits or the move doesn't fit in a byte.
+
+        """
+        if not -VALUE_OFFSET <= value < VALUE_OFFSET or move is not None and not 0 <= move < 255:
+            pack_entry(value, depth, bound, move)  # Raises the error
+
+        index = hash(key) % self.size
+        data = self.data[index]
+        if not data:
+            self.stored += 1
+
+        elif self.keys[index] == key:
+            old_move = (data >> 48) & 0xFF
+            if move is None and old_move:
+                move = old_move - 1  # Keep the old best move if the new search didn't find one
+
+        elif self.replacement == "depth" and (data >> 32) & 0xFF > depth and data >> 56 == self.generation:
+            # A deeper search of a different position is more valuable so we keep it, unless it is from an old search
+            return False
+
+        # Packed here rather than with pack_entry since a search stores most of the nodes it finishes
+        self.data[index] = ((value + VALUE_OFFSET) | min(depth, 255) << 32 | bound << 40
+                            | (0 if move is None else move + 1) << 48 | self.generation << 56)
+        try:
+            self.keys[index] = key
+
+        except OverflowError:
+            self.keys = list(self.keys)
+            self.keys[index] = key
+
+        return True
+
+    def new_generation(self):
+        """
+        Starts a new generation. Entries are kept, but entries from older generations are replaced first.
+        Only 8 bits of the generation are stored in each entry, so it goes back to 0 after 255.
+
+        """
+        self.generation = (self.generation + 1) & 0xFF
+
+    def clear(self):
+        """
+        Removes every entry from the table and resets the statistics.
+
+        """
+        self.keys = array("Q", bytes(WORD_BYTES * self.size))
+        self.data = array("Q", bytes(WORD_BYTES * self.size))
+        self.stored = 0
+        self.generation = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        """
+        Resets the hit, miss and collision counts.
+
+        """
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def stats(self):
+        """
+        Gets the statistics of the table.
+        Returns
+        -------
+        dict
+            The number of hits, misses, collisions and stored entries.
+
+        """
+        return {"hits": self.hits, "misses": self.misses, "collisions": self.collisions, "stored": self.stored,
+                "size": self.size}
+
+    def memory_usage(self):
+        """
+        Measures the memory used by the table, including the keys if they had to be moved to a list.
+        Returns
+        -------
+        int
+            The number of bytes used by the table.
+
+        """
+        total = sys.getsizeof(self.keys) + sys.getsizeof(self.data)
+        if isinstance(self.keys, list):
+            total += sum(sys.getsizeof(key) for key in self.keys if key)
+
+        return total
+
+    def bytes_per_entry(self):
+        """
+        Measures the average memory used by each stored entry, including its share of the empty slots.
+        Returns
+        -------
+        float
+            The number of bytes per stored position.
+
+        """
+        if not self.stored:
+            return 0.0
+
+        return self.memory_usage() / self.stored
+
+    def __len__(self):
+        return self.stored
+
+    def __repr__(self):
+        return f"TranspositionTable({self.size=}, {self.replacement=})"
+
+
+# A shared table starts with a header of three words, the number of slots, the replacement policy and the generation.
+# Each slot is then two words, the data and the key XORed with the data.
+SHARED_HEADER_WORDS = 3
+
+
+def open_untracked(name: str):
+    """
+    Opens existing shared memory without registering it with the resource tracker. Before Python 3.13 opening shared
+    memory registers it as if this process had made it, so the tracker warns that it has leaked and frees it when this
+    process exits, even if the process that made it is still using it.
+    Parameters
+    ----------
+    name: str
+        The name of the shared memory.
+
+    Returns
+    -------
+    shared_memory.SharedMemory
+        The shared memory.
+
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+
+    register = resource_tracker.register
+    resource_tracker.register = lambda resource_name, resource_type: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+
+    finally:
+        resource_tracker.register = register
+
+
+class SharedTranspositionTable:
+    def __init__(self, size=DEFAULT_SIZE, replacement="depth", name=None):
+        """
+        A fixed capacity table of previously searched positions stored in shared memory, so it can be used by many
+        processes at once. Create the table in one process and open it by name in the others. Only the process that
+        created the table starts new generations, and the others are given its generation with each search.
+        Slots are written without a lock. The key is stored XORed with the data, so if two processes write the same
+        slot at once the mixed up entry doesn't match any key and is treated as empty.
+        Parameters
+        ----------
+        size: int
+            The number of slots in the table, ideally a prime number. Ignored when opening an existing table.
+        replacement: str
+            The replacement policy, either "depth" or "always". Ignored when opening an existing table.
+        name: str | None
+            The name of an existing table to open, or None to create a new table.
+
+        Raises
+        ------
+        ValueError
+            If the size is not positive or the replacement policy is not recognised.
+
+        """
+        if name is None:
+            if size < 1:
+                raise ValueError("Transposition table size must be positive.")
+
+            if replacement not in REPLACEMENT_POLICIES:
+                raise ValueError(f"Unknown replacement policy: {replacement}.")
+
+            self._memory = shared_memory.SharedMemory(create=True,
+                                                      size=(SHARED_HEADER_WORDS + 2 * size) * WORD_BYTES)
+            self._words = self._memory.buf.cast("Q")
+            self._words[0] = size
+            self._words[1] = REPLACEMENT_POLICIES.index(replacement)
+            self._words[2] = 0
+            self.owner = True  # The process that created the table is the one that frees it
+
+        else:
+            self._memory = open_untracked(name)
+            self._words = self._memory.buf.cast("Q")
+            self.owner = False
+
+        self.name = self._memory.name
+        self.size = self._words[0]
+        self.replacement = REPLACEMENT_POLICIES[self._words[1]]
+        # The generation of this process's searches. The creator's generation is also kept in the header, so tables
+        # opened by name start with it
+        self.generation = self._words[2]
+
+        # The statistics only count the probes made by this process
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def new_generation(self):
+        """
+        Starts a new generation. Entries are kept, but entries from older generations are replaced first.
+        Only 8 bits of the generation are stored in each entry, so it goes back to 0 after 255.
+        Only the process that created the table starts a generation. Other processes search the same grids, so they
+        take its current generation instead of making each other's entries old.
+
+        """
+        if self.owner:
+            self.generation = (self.generation + 1) & 0xFF
+            self._words[2] = self.generation
+
+        else:
+            self.generation = self._words[2]
+
+    def index(self, key):
+        """
+        Finds the first word of the slot a key is stored in.
+        Parameters
+        ----------
+        key
+            The key of the position.
+
+        Returns
+        -------
+        int
+            The index of the slot's data word.
+
+        """
+        return SHARED_HEADER_WORDS + 2 * (hash(key) % self.size)
+
+    # The entries are packed the same way as in TranspositionTable
+    pack = staticmethod(pack_entry)
+    unpack = staticmethod(unpack_entry)
+
+    def probe(self, key):
+        """
+        Looks up a position in the table. A probe never adds anything to the table.
+        Parameters
+        ----------
+        key
+            The key of the position.
+
+        Returns
+        -------
+        tuple | None
+            The entry (key, value, depth, bound, move, generation) if the position is stored, otherwise None.
+
+        """
+        index = self.index(key)
+        data = self._words[index]
+        check = self._words[index + 1]
+        if data ^ check != key:
+            if data:
+                # The slot is being used by a different position, or two processes wrote it at once
+                self.collisions += 1
+
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        generation = self.generation
+        if data >> 56 != generation:
+            # The entry is being used by this search, so it shouldn't be replaced before entries which aren't
+            data = data & GENERATION_MASK | generation << 56
+            self._words[index] = data
+            self._words[index + 1] = key ^ data
+
+        return (key,) + self.unpack(data)
+
+    def store(self, key, value: int, depth: int, bound: int, move=None):
+        """
+        Stores a position in the table, following the replacement policy if the slot is already in use.
+        Parameters
+        ----------
+        key: int
+            The key of the position, which has to fit in 64 bits.
+        value: int
+            The value found by the search.
+        depth: int
+            The remaining depth the position was searched to.
+        bound: int
+            Whether the value is EXACT, a LOWER bound or an UPPER bound.
+        move: int
+            The best move found from the position.
+
+        Returns
+        -------
+        bool
+            Whether the entry was stored.
+
+        """
+        index = self.index(key)
+        data = self._words[index]
+        generation = self.generation
+        if data:
+            _, old_depth, _, old_move, old_generation = self.unpack(data)
+            if data ^ self._words[index + 1] == key:
+                if move is None:
+                    move = old_move  # Keep the old best move if the new search didn't find one
+
+            elif self.replacement == "depth" and old_depth > depth and old_generation == generation:
+                # A deeper search of a different position is more valuable so we keep it, unless it is from an old
+                # search
+                return False
+
+        data = self.pack(value, depth, bound, move, generation)
+        self._words[index] = data
+        self._words[index + 1] = key ^ data
+        return True
+
+    def clear(self):
+        """
+        Removes every entry from the table and resets the statistics.
+
+        """
+        self._memory.buf[SHARED_HEADER_WORDS * WORD_BYTES:] = bytes(2 * self.size * WORD_BYTES)
+        self._words[2] = 0
+        self.generation = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        """
+        Resets the hit, miss and collision counts.
+
+        """
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def stats(self):
+        """
+        Gets the statistics of the table.
+        Returns
+        -------
+        dict
+            The number of hits, misses and collisions in this process and the number of stored entries.
+
+        """
+        return {"hits": self.hits, "misses": self.misses, "collisions": self.collisions, "stored": len(self),
+                "size": self.size}
+
+    def memory_usage(self):
+        """
+        Measures the shared memory used by the table.
+        Returns
+        -------
+        int
+            The number of bytes used by the table.
+
+        """
+        return (SHARED_HEADER_WORDS + 2 * self.size) * WORD_BYTES
+
+    def bytes_per_entry(self):
+        """
+        Measures the memory used by each slot.
+        Returns
+        -------
+        float
+            The number of bytes per slot.
+
+        """
+        return 2.0 * WORD_BYTES
+
+    def close(self):
+        """
+        Stops this process using the table. The process that created the table also frees the shared memory.
+        Closing a table more than once does nothing.
+
+        """
+        if self._words is None:
+            return
+
+        self._release()
+        if self.owner:
+            self._memory.unlink()
+
+    def _release(self):
+        # The view of the memory has to be released before the memory can be closed
+        self._words.release()
+        self._words = None
+        self._memory.close()
+
+    def __del__(self):
+        # Only the handle is closed, since the creator might still be using the table after losing a reference to it
+        if getattr(self, "_words", None) is not None:
+            self._release()
+
+    def __reduce__(self):
+        # Other processes open the same shared memory rather than getting a copy of the table
+        return SharedTranspositionTable, (self.size, self.replacement, self.name)
+
+    def __len__(self):
+        return sum(1 for index in range(SHARED_HEADER_WORDS, SHARED_HEADER_WORDS + 2 * self.size, 2)
+                   if self._words[index])
+
+    def __repr__(self):
+        return f"SharedTranspositionTable({self.name=}, {self.size=}, {self.replacement=})"
+
@@ -0,0 +1,81 @@
+import pytest
+from main_project.analysis_store import AnalysisStore
+from main_project.back_end import Game
+from main_project.connect_4_cli import Interface
+from main_project.strategy import Evaluator
+from main_project.connect4_grid import Grid
+from main_project.paths import data_directory
+import math
+import os
+
+
+class TestAnalysisStore:
+    @pytest.fixture()
+    def path(self, tmp_path):
+        return str(tmp_path / "analysis.sqlite")
+
+    @pytest.fixture()
+    def evaluator(self):
+        grid = Grid()
+        for _ in range(3):
+            grid.add_piece(0, "R")
+
+        evaluator = Evaluator(grid, "B", 4)
+        evaluator.grid_to_int()
+        evaluator.calculate_move_values()
+        return evaluator
+
+    def test_save_and_lookup(self, path, evaluator):
+        store = AnalysisStore(path)
+        assert store.lookup(evaluator, 4) is None
+        store.save(evaluator, 4)
+        # The result can be looked up before it has been written
+        assert store.lookup(evaluator, 4) == (evaluator.move_values, False)
+        store.flush()
+        assert store.lookup(evaluator, 4) == (evaluator.move_values, False)
+        # A deeper search is good enough but a shallower one isn't
+        assert store.lookup(evaluator, 3) is not None
+        assert store.lookup(evaluator, 5) is None
+        store.close()
+
+    def test_kept_between_runs(self, path, evaluator):
+        store = AnalysisStore(path)
+        store.save(evaluator, 4)
+        store.close()
+
+        store = AnalysisStore(path)
+        assert len(store) == 1
+        assert store.lookup(evaluator, 4)[0][1][0] == -math.inf
+        store.close()
+
+    def test_mirror_image(self, path, evaluator):
+        store = AnalysisStore(path)
+        store.save(evaluator, 4)
+        mirrored = Evaluator(Grid(), "B", 4)
+        mirrored.set_position(evaluator.mirror(evaluator.get_mask()), evaluator.mirror(evaluator.get_position()))
+        assert store.lookup(mirrored, 4) == (evaluator.move_values[::-1], False)
+        store.close()
+
+    def test_game_uses_store(self, path):
+        store = AnalysisStore(path)
+        game = Game(Interface(), analysis_store=store)
+        game.add_computer_player("WALL-E", 5, "B")
+        game.add_computer_player("EVE", 5, "R")
+        move_values = game.analyse_turn(0, 4)
+        store.flush()
+        assert len(store) == 1
+        assert game.analyse_turn(0, 4) == move_values
+        store.close()
+
+    def test_data_directory(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("CONNECT4_DATA", str(tmp_path))
+        assert data_directory() == str(tmp_path)
+        monkeypatch.delenv("CONNECT4_DATA")
+        monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path))
+        if os.name != "nt":
+            assert data_directory() == os.path.join(str(tmp_path), "connect4")
+
+        # The directory is made when the store is opened
+        store = AnalysisStore(str(tmp_path / "new" / "analysis.sqlite"))
+        assert os.path.isdir(tmp_path / "new")
+        store.close()
@@ -0,0 +1,35 @@
+import pytest
+from main_project.benchmark_suite import POSITION_SETS, position_from_moves, run_suite, save_results, load_results, \
+    compare
+
+
+@pytest.fixture(scope="module")
+def results():
+    position_sets = {("opening", "easy"): ["34423443"], ("endgame", "easy"): ["55341332334442412242321161"]}
+    return run_suite(position_sets, {"opening": 4, "endgame": 4})
+
+
+class TestBenchmarkSuite:
+    def test_positions_are_legal(self):
+        for positions in POSITION_SETS.values():
+            for moves in positions:
+                grid, symbol = position_from_moves(moves)
+                assert grid.num_pieces == len(moves)
+                assert symbol == ("R" if len(moves) % 2 == 0 else "B")
+                assert not grid.check_win()
+
+    def test_results(self, results):
+        assert set(results["sets"]) == {"opening/easy", "endgame/easy"}
+        totals = results["sets"]["opening/easy"]
+        assert totals["nodes"] == totals["positions"][0]["nodes"] > 0
+        assert totals["positions"][0]["depth"] == 4
+
+    def test_save_and_compare(self, results, tmp_path):
+        path = str(tmp_path / "results.json")
+        save_results(results, path)
+        baseline = load_results(path)
+        comparison = compare(results, baseline)
+        assert comparison["opening/easy"]["speedup"] == pytest.approx(1)
+        assert comparison["opening/easy"]["node_ratio"] == 1
+        del baseline["sets"]["endgame/easy"]
+        assert set(compare(results, baseline)) == {"opening/easy"}
@@ -1,7 +1,9 @@
 import pytest
 from main_project.back_end import Game, Player, ComputerPlayer
 from main_project.connect_4_cli import Interface
-from main_project.connect4_grid import Grid
+from main_project.connect4_grid import Grid, CompactGrid
+from main_project.opening_book import DEFAULT_BOOK_PATH, generate_book, load_book
+from main_project import opening_book
 import math
 
 class TestGame:
@@ -31,15 +33,73 @@ class TestGame:
         assert default_game.players[1].difficulty == 5
         assert default_game.players[1].symbol == "B"
 
+    def test_strategy_settings(self, default_game):
+        default_game.add_computer_player("WALL-E", 5, "B", strategy_settings={"depth": 3, "select_p": 0.5, "book": None,
+                                                                           "options": {"workers": 1}})
+        strategy = default_game.players[0].strategy
+        assert strategy.evaluator._depth == 3
+        assert strategy.select_p == 0.5
+        assert strategy.book is None
+        assert strategy.evaluator.workers == 1
+        assert strategy.symbol == "B"
+
+    def test_book_difficulty(self, default_game, tmp_path, monkeypatch):
+        path = str(tmp_path / "book.bin")
+        generate_book(path, 1, 4)
+        # Use the small book as the default book
+        monkeypatch.setitem(opening_book._open_books, DEFAULT_BOOK_PATH, load_book(path))
+        default_game.add_computer_player("Easy", 1, "B")
+        default_game.add_computer_player("Hard", 2, "R")
+        # The easy player searches less deeply than the book, so its moves would be much stronger than its searches
+        assert default_game.players[0].strategy.book is None
+        assert default_game.players[1].strategy.book is load_book(path)
+        load_book(path).close()
+
     def test_computer_player(self, winning_game):
         assert winning_game.players[0].get_move() == 0
 
-    def test_evaluate_move(self, winning_game):
-        winning_game.past_states[1] =(winning_game.grid, 0, 2)
-        winning_game.past_states[2] = (winning_game.grid, 0, 2)
+    def test_compact_grid(self):
+        game = Game(Interface(), grid_class=CompactGrid)
+        game.add_computer_player("WALL-E", 5, "B")
+        for i in range(3):
+            game.grid.add_piece(0, "B")
+
+        assert game.players[0].get_move() == 0
+
+    @staticmethod
+    def play_moves(game, moves):
+        # Makes the moves as if the players had chosen them
+        for move in moves:
+            game.current_player = game.players[(game.turn_num - 1) % len(game.players)]
+            game.grid.add_piece(move, game.current_player.symbol)
+            game.add_to_past_dict(move)
+            game.turn_num += 1
+
+    @pytest.fixture()
+    def played_game(self):
+        game = Game(Interface(), checkpoint_interval=2)
+        game.add_computer_player("WALL-E", 5, "B")
+        game.add_human_player("Albert", "R")
+        # Blue has 3 in a row in the first column and red has 2 in the second
+        self.play_moves(game, [0, 1, 0, 1, 0])
+        return game
+
+    def test_evaluate_move(self, played_game):
         # Check if not stopping 4-in-a-row gives -inf
-        assert winning_game.evaluate_move(1, 5)[1] == -math.inf
+        assert played_game.evaluate_move(5, 5)[1] == -math.inf
+        self.play_moves(played_game, [1])
         # Check if completing 4-in-a-row gives inf
-        assert winning_game.evaluate_move(2, 5)[0] == math.inf
-
+        assert played_game.evaluate_move(6, 5)[0] == math.inf
 
+    def test_past_states(self, played_game):
+        grid, move, row = played_game.past_states[3]
+        assert (move, row) == (0, 1)
+        assert grid.get_bitboard("B") == grid.cell_bit(0, 0) | grid.cell_bit(1, 0)
+        assert played_game.past_states[0][0].mask == 0
+        assert played_game.past_states[5][0].mask == played_game.grid.mask
+        assert len(played_game.past_states) == 6
+        # Rebuilding a grid doesn't change the history
+        played_game.past_states[4][0].add_piece(3, "R")
+        assert played_game.past_states[4][0].column_height(3) == 0
+        with pytest.raises(IndexError):
+            played_game.past_states[6]
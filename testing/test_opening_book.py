@@ -0,0 +1,83 @@
+import pytest
+from main_project.opening_book import OpeningBook, generate_book, load_book, HEADER, HEADER_V1, ENTRY, MAGIC
+from main_project.strategy import Evaluator, Strategy
+from main_project.connect4_grid import Grid
+
+
+class TestOpeningBook:
+    @pytest.fixture()
+    def book(self, tmp_path):
+        path = str(tmp_path / "book.bin")
+        generate_book(path, 2, 4)
+        book = load_book(path)
+        yield book
+        book.close()
+
+    def test_generate_book(self, book):
+        # 1 empty grid, 4 grids after 1 move and 25 after 2 moves once mirror images are removed
+        assert len(book) == 1 + 4 + 25
+
+    @pytest.mark.parametrize("rules, plies, depth", [((4, 4, 3), 5, 6), ((6, 7, 4), 5, 2)])
+    def test_deep_book(self, tmp_path, rules, plies, depth):
+        # Deeper books include grids where a move wins or is forced, which are scored without being cached
+        path = str(tmp_path / "book.bin")
+        num_entries = generate_book(path, plies, depth, *rules)
+        data = (tmp_path / "book.bin").read_bytes()
+        evaluator = Evaluator(Grid(*rules), "", 0)
+        for index in range(num_entries):
+            key, move, _ = ENTRY.unpack_from(data, HEADER.size + index * ENTRY.size)
+            mask, _ = evaluator.unpack_key(key)
+            assert 0 <= move < rules[1]
+            assert not evaluator.check_bit(mask, move, 0)
+
+    def test_lookup(self, book):
+        assert book.lookup(0, 0)[0] == 3
+        grid = Grid()
+        for _ in range(3):
+            grid.add_piece(0, "R")
+
+        # Grids with more moves than the book are not in it
+        evaluator = Evaluator(grid, "B", 0)
+        evaluator.grid_to_int()
+        assert book.lookup(evaluator.get_mask(), evaluator.get_position()) is None
+
+    def test_mirrored_lookup(self, book):
+        evaluator = Evaluator(Grid(), "R", 0)
+        left = evaluator.make_move(*evaluator.make_move(0, 0, 0)[:2], 1)
+        right = evaluator.make_move(*evaluator.make_move(0, 0, 6)[:2], 5)
+        left_move, left_score = book.lookup(left[0], left[1])
+        right_move, right_score = book.lookup(right[0], right[1])
+        assert left_move == 6 - right_move
+        assert left_score == right_score
+
+    def test_strategy_uses_book(self, book):
+        grid = Grid()
+        strategy = Strategy(grid, "R", 4, 1.0, book=book)
+        assert strategy.move() == 3
+        # The book move is returned without searching
+        assert strategy.evaluator.stats.nodes == 0
+
+    def test_book_rules(self, book):
+        assert Strategy(Grid(6, 8), "R", 4, 1.0, book=book).book is None
+
+    def test_book_depth(self, book, tmp_path):
+        assert book.depth == 4
+        # Version 1 books were always searched to depth 12
+        path = tmp_path / "old_book.bin"
+        with open(book.path, "rb") as file:
+            entries = file.read()[HEADER.size:]
+
+        path.write_bytes(HEADER_V1.pack(MAGIC, 1, 6, 7, 4, 2, len(book)) + entries)
+        old_book = OpeningBook(str(path))
+        assert old_book.depth == 12
+        assert old_book.lookup(0, 0) == book.lookup(0, 0)
+        old_book.close()
+
+    def test_invalid_book(self, tmp_path):
+        path = tmp_path / "book.bin"
+        path.write_bytes(b"not an opening book")
+        with pytest.raises(ValueError):
+            OpeningBook(str(path))
+
+    def test_missing_book(self, tmp_path):
+        assert load_book(str(tmp_path / "missing.bin")) is None
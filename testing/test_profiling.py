@@ -0,0 +1,65 @@
+import pytest
+from main_project import profiling
+from main_project.back_end import Game
+from main_project.connect_4_cli import NullInterface
+from main_project.connect4_grid import Grid
+from main_project.strategy import Strategy
+import json
+import os
+import pstats
+
+
+class TestProfiling:
+    @pytest.fixture()
+    def directory(self, tmp_path):
+        yield str(tmp_path)
+        profiling.disable_profiling()
+
+    @staticmethod
+    def play_moves(game, num_moves):
+        game.current_player = game.players[0]
+        for _ in range(num_moves):
+            game.make_player_move()
+            game.turn_num += 1
+            game.current_player = game.players[(game.turn_num - 1) % 2]
+
+    def test_off_by_default(self, directory):
+        assert not profiling.profiling_enabled()
+        Strategy(Grid(), "R", 2, 1.0).move()
+        assert os.listdir(directory) == []
+
+    def test_game_moves(self, directory):
+        profiling.enable_profiling(directory)
+        game = Game(NullInterface())
+        game.add_computer_player("WALL-E", 5, "R")
+        game.add_computer_player("EVE 2", 5, "B")
+        self.play_moves(game, 2)
+        # The strategy's move is part of the game's profile so it doesn't get its own file
+        assert sorted(os.listdir(directory)) == [f"{game.game_id}-turn001-WALL-E.prof",
+                                                 f"{game.game_id}-turn002-EVE_2.prof"]
+        stats = pstats.Stats(os.path.join(directory, f"{game.game_id}-turn001-WALL-E.prof"))
+        assert any(function[2] == "negamax" for function in stats.stats)
+
+    def test_chrome_trace(self, directory):
+        profiling.enable_profiling(directory, "chrome")
+        grid = Grid()
+        grid.add_piece(3, "R")
+        Strategy(grid, "B", 4, 1.0).move()
+        with open(os.path.join(directory, "nogame-turn002-strategy-B.json")) as file:
+            trace = json.load(file)
+
+        assert trace["otherData"] == {"game_id": None, "turn": 2, "label": "strategy-B"}
+        events = {event["name"]: event for event in trace["traceEvents"]}
+        move, negamax = events["choose_move"], events["negamax"]
+        # Functions are drawn inside the functions that called them
+        assert move["ts"] <= negamax["ts"] and negamax["ts"] + negamax["dur"] <= move["ts"] + move["dur"] + 1
+
+    def test_disable(self, directory):
+        with pytest.raises(ValueError):
+            profiling.enable_profiling(directory, "svg")
+
+        profiling.enable_profiling(directory)
+        assert profiling.profiling_enabled()
+        profiling.disable_profiling()
+        Strategy(Grid(), "R", 2, 1.0).move()
+        assert os.listdir(directory) == []
@@ -3,6 +3,7 @@ from main_project import strategy
 from main_project.connect4_grid import Grid
 import math
 import random
+import time
 
 
 class TestEvaluator:
@@ -84,19 +85,158 @@ class TestEvaluator:
         assert not evaluators[3].check_n_in_a_row(evaluators[3]._position)
         assert evaluators[4].check_n_in_a_row(evaluators[4]._position)
 
+    def test_winning_cells(self, evaluator_2, evaluator_3):
+        # The only winning cell is on top of the 3-in-a-row
+        assert evaluator_2.winning_cells(evaluator_2._position, evaluator_2._mask) == 1 << 45
+        opponent = evaluator_3._position ^ evaluator_3._mask
+        assert evaluator_3.winning_cells(opponent, evaluator_3._mask) == 1 << 38
+        assert evaluator_3.winning_cells(0, evaluator_3._mask) == 0
+
+    def test_non_losing_moves(self, evaluator_2, evaluator_3):
+        assert evaluator_2.non_losing_moves() == list(range(7))
+        # Winning is always allowed, otherwise the opponent has to be blocked
+        assert evaluator_3.non_losing_moves() == [0, 1]
+
+    @staticmethod
+    def brute_force_n_in_a_row(evaluator, position, n):
+        # Checks every line of n cells one cell at a time
+        cells = {(column, row) for column in range(evaluator.num_columns) for row in range(evaluator.num_rows)
+                 if evaluator.check_bit(position, column, row)}
+        for column, row in cells:
+            for column_step, row_step in [(0, 1), (1, 0), (1, 1), (1, -1)]:
+                if all((column + i * column_step, row + i * row_step) in cells for i in range(n)):
+                    return True
+
+        return False
+
+    def test_general_n_in_a_row(self):
+        generator = random.Random(0)
+        for num_rows, num_columns, win_num in [(6, 7, 4), (6, 7, 3), (6, 7, 5), (5, 9, 2), (8, 8, 6), (4, 10, 7)]:
+            evaluator = strategy.Evaluator(Grid(num_rows, num_columns, win_num), "R", 0, cache_size=1)
+            for _ in range(50):
+                mask, position = 0, 0
+                for _ in range(generator.randint(0, num_rows * num_columns)):
+                    column = generator.choice([column for column in range(num_columns)
+                                               if not evaluator.check_bit(mask, column, 0)])
+                    mask, position, _ = evaluator.make_move(mask, position, column)
+
+                has_line = self.brute_force_n_in_a_row(evaluator, position, win_num)
+                assert evaluator.check_n_in_a_row(position) == has_line
+                if has_line:
+                    continue
+
+                winning_cells = evaluator.winning_cells(position, mask)
+                for column in range(num_columns):
+                    for row in range(num_rows):
+                        cell = 1 << ((num_rows + 1) * (num_columns - column) - (row + 2))
+                        assert bool(winning_cells & cell) == (not mask & cell and self.brute_force_n_in_a_row(
+                            evaluator, position | cell, win_num))
+
     def test_make_move(self, evaluators):
         move_0 = evaluators[0].make_move(evaluators[0]._mask, evaluators[0]._position, 6)
         assert move_0[0] == 1
         assert move_0[1] == 0
         assert move_0[2] == 0
 
+    def test_position_key(self, evaluators):
+        keys = set()
+        for evaluator in evaluators:
+            key = evaluator.position_key(evaluator._mask, evaluator._position)
+            assert evaluator.unpack_key(key) == (evaluator._mask, evaluator._position)
+            keys.add(key)
+
+        assert len(keys) == len(evaluators)
+
+    def test_cache_probe(self, empty_grid):
+        assert empty_grid.get_cache(empty_grid._mask, empty_grid._position, 1) is None
+        assert len(empty_grid.cache) == 0
+        empty_grid.set_cache(empty_grid._mask, empty_grid._position, 7, 2)
+        assert empty_grid.get_cache(empty_grid._mask, empty_grid._position, 1)[1] == 7
+        assert empty_grid.get_cache(empty_grid._mask, empty_grid._position, 3) is None
+
+    def test_mirror(self, evaluator_3):
+        mirrored = evaluator_3.mirror(evaluator_3._mask)
+        assert evaluator_3.mirror(mirrored) == evaluator_3._mask
+        # The pieces in the first two columns are moved to the last two columns
+        assert [evaluator_3.check_bit(mirrored, column, 5) for column in range(7)] == [False] * 5 + [True] * 2
+
+    def test_symmetric_cache(self, evaluator_3):
+        key, mirrored = evaluator_3.cache_key(evaluator_3._mask, evaluator_3._position)
+        mirror_key, mirror_mirrored = evaluator_3.cache_key(evaluator_3.mirror(evaluator_3._mask),
+                                                            evaluator_3.mirror(evaluator_3._position))
+        assert key == mirror_key
+        assert mirrored != mirror_mirrored
+
+        # The best move is stored for one of the grids and translated for the other
+        evaluator_3.set_cache(evaluator_3._mask, evaluator_3._position, 5, 2, move=1)
+        assert evaluator_3.get_cache(evaluator_3.mirror(evaluator_3._mask), evaluator_3.mirror(evaluator_3._position),
+                                     2)[4] == 5
+
+    def test_symmetric_root(self, empty_grid):
+        values = empty_grid.calculate_move_values(3)
+        assert values == values[::-1]
+        unmirrored = strategy.Evaluator(empty_grid.grid, "R", 3, symmetry=False)
+        unmirrored.grid_to_int()
+        assert unmirrored.calculate_move_values(3) == values
+        assert empty_grid.stats.nodes < unmirrored.stats.nodes
+
     def test_minimax(self, evaluators):
-        assert not evaluators[0].evaluate_self()[0]
+        # The empty grid is not a forced win or loss for either player within the search depth
+        assert abs(evaluators[0].evaluate_self()[0]) != math.inf
         assert not evaluators[1].evaluate_self()[0]
         assert evaluators[2].evaluate_self() == (math.inf, 1)
         assert evaluators[3].evaluate_self() == (math.inf, 1)
         assert evaluators[4].evaluate_self() == (math.inf, 1)
 
+    def test_negamax(self, evaluators):
+        # Winning on the next move leaves 38 empty cells
+        assert evaluators[2].negamax(evaluators[2]._mask, evaluators[2]._position, 2, -strategy.MAX_SCORE,
+                                     strategy.MAX_SCORE) == strategy.WIN_SCORE + 38
+        assert evaluators[2].score_to_value(strategy.WIN_SCORE + 38, evaluators[2]._mask) == (math.inf, 1)
+        # A win further away leaves fewer empty cells so it scores less
+        assert evaluators[2].score_to_value(strategy.WIN_SCORE + 36, evaluators[2]._mask) == (math.inf, 3)
+        assert evaluators[2].score_to_value(-(strategy.WIN_SCORE + 37), evaluators[2]._mask) == (-math.inf, 2)
+
+    def test_move_order(self, empty_grid):
+        assert empty_grid.calculate_move_order() == [3, 2, 4, 1, 5, 0, 6]
+        empty_grid.center_ordering = False
+        assert empty_grid.calculate_move_order() == [0, 1, 2, 3, 4, 5, 6]
+
+    def test_move_ordering_switches(self, evaluator_3):
+        values = evaluator_3.calculate_move_values(4)
+        unordered = strategy.Evaluator(evaluator_3.grid, "R", 8, center_ordering=False, killer_moves=False,
+                                       history_heuristic=False)
+        unordered.grid_to_int()
+        # The order moves are searched in should change the speed of the search but not the result
+        assert unordered.calculate_move_values(4) == values
+        assert unordered.stats.nodes > evaluator_3.stats.nodes
+
+    def test_endgame(self, empty_grid):
+        # Four in a row is impossible on a 3x3 grid and there are few enough cells to search to the end
+        evaluator = strategy.Evaluator(Grid(3, 3), "R", 1)
+        evaluator.grid_to_int()
+        assert [value[0] for value in evaluator.calculate_move_values()] == [0, 0, 0]
+        assert evaluator.solved
+
+        empty_grid.calculate_move_values(2)
+        assert not empty_grid.solved
+        # The values from the depth 2 search are reused, so they still aren't exact
+        empty_grid.calculate_move_values(42)
+        assert not empty_grid.solved
+
+    def test_timed_endgame(self):
+        grid = Grid(3, 3)
+        grid.add_piece(1, "R")
+        evaluator = strategy.Evaluator(grid, "B", 4)
+        evaluator.grid_to_int()
+        # Only the first search runs without a deadline, so it doesn't search to the end of the game
+        evaluator.iterative_deepening(0)
+        assert evaluator.completed_depth == 1
+        assert not evaluator.solved
+        evaluator.iterative_deepening(10)
+        assert evaluator.completed_depth == 8
+        assert evaluator.solved
+
     def test_heuristic(self, evaluators):
         assert evaluators[0].evaluate_grid(evaluators[0]._position) == 0
         assert evaluators[1].evaluate_grid(evaluators[1]._position) == 276
@@ -105,6 +245,53 @@ class TestEvaluator:
         assert evaluators[4].evaluate_grid(evaluators[4]._position) == 17
 
 
+    def test_evaluate_difference(self, evaluators):
+        for evaluator in evaluators:
+            assert evaluator.evaluate_difference(evaluator._mask, evaluator._position) == evaluator.evaluate_grid(
+                evaluator._position) - evaluator.evaluate_grid(evaluator._position ^ evaluator._mask)
+
+        assert evaluators[3].evaluate_difference(evaluators[3]._mask, evaluators[3]._position) == 12 - 18
+
+    def test_line_weights(self):
+        assert strategy.line_weights(6, 7, 4) == [[3, 4, 5, 7, 5, 4, 3], [4, 6, 8, 10, 8, 6, 4],
+                                                  [5, 8, 11, 13, 11, 8, 5], [5, 8, 11, 13, 11, 8, 5],
+                                                  [4, 6, 8, 10, 8, 6, 4], [3, 4, 5, 7, 5, 4, 3]]
+        # On a 3x3 grid with 3 in a row the middle is in every line and the corners are in 3
+        assert strategy.line_weights(3, 3, 3) == [[3, 2, 3], [2, 4, 2], [3, 2, 3]]
+
+    def test_weights_shared(self):
+        grid = Grid(8, 9, 5)
+        first = strategy.Evaluator(grid, "R", 4, cache_size=1)
+        second = strategy.Evaluator(Grid(8, 9, 5), "R", 4, cache_size=1)
+        assert first.calculate_weights() is second.calculate_weights()
+        assert first._weight_planes is second._weight_planes
+        assert all(weight > 0 for row in first.calculate_weights() for weight in row)
+
+        grid.add_piece(4, "R")
+        first.grid_to_int()
+        assert first.evaluate_grid(first._position) == first.calculate_weights()[7][4]
+
+    def test_search_stats(self, evaluator_3):
+        evaluator_3.calculate_move_values()
+        stats = evaluator_3.stats
+        assert stats.nodes > stats.leaves > 0
+        assert stats.cache_probes >= stats.cache_hits
+        assert stats.cache_stores > 0
+        assert sum(stats.cutoff_indices) == stats.cutoffs > 0
+        assert 0 < stats.max_depth <= evaluator_3._depth + 1
+
+        assert evaluator_3.reset_stats() is stats
+        assert evaluator_3.stats.nodes == evaluator_3.stats.max_depth == 0
+        evaluator_3.move_values = []
+        evaluator_3.calculate_move_values()
+        # The cache is still full from the first search, so the second one is much smaller
+        assert 0 < evaluator_3.stats.nodes < stats.nodes
+        assert evaluator_3.stats.cache_hits > 0
+
+        stats.merge(evaluator_3.stats)
+        assert stats.as_dict()["cache_hits"] == stats.cache_hits
+
+
 class TestStrategy:
     @pytest.fixture()
     def testing_grid(self):
@@ -127,6 +314,100 @@ class TestStrategy:
         perfect_strategy = strategy.Strategy(testing_grid, "R", 5, 1.0)
         return perfect_strategy
 
+    @pytest.fixture()
+    def timed_strategy(self, testing_grid):
+        timed_strategy = strategy.Strategy(testing_grid, "R", 20, 1.0, 0.2)
+        return timed_strategy
+
+    def test_forced_move(self):
+        grid = Grid()
+        for i in range(3):
+            grid.add_piece(3, "B")
+
+        forced_strategy = strategy.Strategy(grid, "R", 5, 1.0)
+        assert forced_strategy.move() == 3
+        assert forced_strategy.evaluator.stats.nodes == 0
+
+    def test_workers_in_options(self, testing_grid):
+        assert strategy.Strategy(testing_grid, "R", 4, 1.0, options={"workers": 2}).evaluator.workers == 2
+        assert strategy.Strategy(testing_grid, "R", 4, 1.0, workers=2, options={"workers": 2}).evaluator.workers == 2
+        with pytest.raises(ValueError):
+            strategy.Strategy(testing_grid, "R", 4, 1.0, workers=2, options={"workers": 3})
+
+    def test_move_stats(self, perfect_strategy):
+        perfect_strategy.move()
+        stats = perfect_strategy.last_stats
+        assert stats["nodes"] == perfect_strategy.evaluator.stats.nodes > 0
+        assert stats["move"] in range(7)
+        assert stats["seconds"] > 0
+        assert 0 <= stats["cache_hit_rate"] <= 1
+
+    def test_iterative_deepening(self, timed_strategy):
+        assert timed_strategy.move() == 0
+        # Winning in one move is found by the first search so there is no need to search deeper
+        assert timed_strategy.evaluator.completed_depth == 1
+
+    def test_time_limit(self):
+        timed_strategy = strategy.Strategy(Grid(), "R", 20, 1.0, 0.05)
+        start = time.perf_counter()
+        timed_strategy.move()
+        assert time.perf_counter() - start < 1
+        assert 1 <= timed_strategy.evaluator.completed_depth < 20
+
+    def test_cache_reuse(self, testing_grid):
+        evaluator = strategy.Evaluator(testing_grid, "R", 6)
+        evaluator.grid_to_int()
+        evaluator.calculate_move_values()
+        stored = len(evaluator.cache)
+        generation = evaluator.cache.generation
+
+        testing_grid.add_piece(3, "R")
+        testing_grid.add_piece(3, "B")
+        evaluator.grid_to_int()
+        # The entries from the last move are kept but are now from an older generation
+        assert len(evaluator.cache) == stored
+        assert evaluator.cache.generation == generation + 1
+        evaluator.calculate_move_values()
+        assert len(evaluator.cache) > stored
+
+    def test_parallel_search(self, testing_grid):
+        serial = strategy.Evaluator(testing_grid, "R", 6)
+        serial.grid_to_int()
+        parallel = strategy.Evaluator(testing_grid, "R", 6, workers=2)
+        parallel.grid_to_int()
+        try:
+            assert parallel.calculate_move_values() == serial.calculate_move_values()
+            # The counts from the workers are added to the evaluator's
+            assert parallel.stats.nodes == serial.stats.nodes
+            # The same pool is used for the next search
+            pool = strategy.get_pool(2)
+            parallel.move_values = []
+            values = parallel.calculate_move_values(4)
+            assert [value is None for value in values] == [value is None for value in serial.move_values]
+            assert strategy.get_pool(2) is pool
+
+        finally:
+            strategy.shutdown_pools()
+
+    def test_shared_cache(self, testing_grid):
+        serial = strategy.Evaluator(testing_grid, "R", 6)
+        serial.grid_to_int()
+        shared_cache = strategy.SharedTranspositionTable(1009)
+        parallel = strategy.Evaluator(testing_grid, "R", 6, workers=2, cache=shared_cache)
+        parallel.grid_to_int()
+        try:
+            generation = shared_cache.generation
+            assert parallel.calculate_move_values() == serial.calculate_move_values()
+            # Every worker stored its positions in the one table, using the generation of this process
+            assert len(shared_cache) > 0
+            assert shared_cache._words[2] == generation
+            with pytest.raises(ValueError):
+                strategy.Evaluator(Grid(8, 8), "R", 6, cache=shared_cache)
+
+        finally:
+            strategy.shutdown_pools()
+            shared_cache.close()
+
     def test_strategies(self, random_strategy, perfect_strategy):
         random.seed(0)
         random_strategy.rank_moves()
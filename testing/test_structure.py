@@ -1,5 +1,7 @@
 import pytest
-from main_project.connect4_grid import Grid
+from main_project.connect4_grid import Grid, CompactGrid
+import copy
+import random
 
 
 class TestGrid:
@@ -65,10 +67,149 @@ class TestGrid:
         for grid in four_in_a_rows:
             assert grid.check_win()
 
+    def test_check_win_from(self, three_in_a_row, four_in_a_rows):
+        assert not three_in_a_row.check_win_from(0, 2)
+        assert not three_in_a_row.check_win_from(0, 3)
+        # The last piece added to each grid completes the line
+        assert four_in_a_rows[0].check_win_from(0, 3)
+        assert four_in_a_rows[1].check_win_from(3, 0)
+        assert four_in_a_rows[2].check_win_from(3, 3)
+        assert four_in_a_rows[3].check_win_from(0, 3)
+        assert four_in_a_rows[2].winning_symbol == "R"
+
+    @pytest.mark.parametrize("num_rows, num_columns", [(5, 6), (3, 9), (9, 3)])
+    def test_check_win_from_random(self, num_rows, num_columns):
+        generator = random.Random(1)
+        for grid_class in (Grid, CompactGrid):
+            for _ in range(50):
+                grid = grid_class(num_rows, num_columns, 3)
+                # Every move is checked until someone wins, so the full scan only finds the new line
+                while not grid.grid_full():
+                    column = generator.choice([column for column in range(num_columns)
+                                               if grid.column_height(column) < num_rows])
+                    grid.add_piece(column, generator.choice("RB"))
+                    won = grid.check_win_from(grid.column_height(column) - 1, column)
+                    assert won == grid.check_win()
+                    if won:
+                        break
+
     def test_column_height(self, empty_grid, full_grid, three_in_a_row):
         assert empty_grid.column_height(0) == 0
         assert full_grid.column_height(0) == 6
         assert three_in_a_row.column_height(0) == 1
+        with pytest.raises(ValueError):
+            empty_grid.column_height(7)
+
+    def test_add_piece_full_column(self, full_grid):
+        assert full_grid.num_pieces == 42
+        with pytest.raises(IndexError):
+            full_grid.add_piece(0, "R")
+
+        # Emptying a cell frees the column again
+        full_grid.set_cell(5, 0, None)
+        assert not full_grid.grid_full()
+        assert full_grid.column_height(0) == 5
+        full_grid.add_piece(0, "B")
+        assert full_grid.cells[(5, 0)].symbol == "B"
+        assert full_grid.grid_full()
+
+    def test_tall_grid(self):
+        # Columns taller than the grid is wide used to be cut off at num_columns pieces
+        grid = Grid(8, 3, 4)
+        for _ in range(8):
+            grid.add_piece(1, "R")
 
+        assert grid.column_height(1) == 8
+        with pytest.raises(IndexError):
+            grid.add_piece(1, "R")
 
+    def test_bitboards(self, empty_grid, three_in_a_row):
+        assert empty_grid.mask == 0
+        assert three_in_a_row.get_bitboard("R") == three_in_a_row.mask
+        assert three_in_a_row.get_bitboard("B") == 0
+        assert three_in_a_row.mask == (1 << 42) | (1 << 35) | (1 << 28)
 
+        three_in_a_row.set_cell(0, 1, "B")
+        assert three_in_a_row.get_bitboard("R") == (1 << 42) | (1 << 28)
+        assert three_in_a_row.get_bitboard("B") == 1 << 35
+        three_in_a_row.set_cell(0, 1, None)
+        assert three_in_a_row.mask == (1 << 42) | (1 << 28)
+
+
+class TestCompactGrid:
+    @pytest.fixture()
+    def grids(self):
+        # The same random moves played on both kinds of grid
+        generator = random.Random(0)
+        grid = Grid()
+        compact_grid = CompactGrid()
+        for turn in range(20):
+            column = generator.choice([column for column in range(7) if grid.column_height(column) < 6])
+            grid.add_piece(column, ["R", "B"][turn % 2])
+            compact_grid.add_piece(column, ["R", "B"][turn % 2])
+
+        return grid, compact_grid
+
+    def test_same_as_grid(self, grids):
+        grid, compact_grid = grids
+        assert compact_grid.mask == grid.mask
+        assert compact_grid.get_bitboard("R") == grid.get_bitboard("R")
+        assert str(compact_grid) == str(grid)
+        for column in range(7):
+            assert compact_grid.column_height(column) == grid.column_height(column)
+
+        for cell in grid.cells:
+            assert compact_grid.cells[cell].symbol == grid.cells[cell].symbol
+
+    def test_check_win(self):
+        three_in_a_row = CompactGrid()
+        for column in range(3):
+            three_in_a_row.add_piece(column, "R")
+
+        assert not three_in_a_row.check_win()
+
+        # //
+        diagonal = CompactGrid()
+        for column in range(4):
+            for _ in range(column):
+                diagonal.add_piece(column, "B")
+
+            diagonal.add_piece(column, "R")
+
+        assert diagonal.check_win()
+        assert diagonal.winning_symbol == "R"
+
+        # Lines can't wrap from the top of one column to the bottom of the next
+        wrapped = CompactGrid(4, 2, 3)
+        for symbol in "BBRR":
+            wrapped.add_piece(0, symbol)
+
+        wrapped.add_piece(1, "R")
+        assert not wrapped.check_win()
+
+    def test_full(self):
+        grid = CompactGrid(2, 2, 2)
+        for column in range(2):
+            grid.add_piece(column, "R")
+            grid.add_piece(column, "B")
+
+        assert grid.grid_full()
+        with pytest.raises(IndexError):
+            grid.add_piece(0, "R")
+
+    def test_deepcopy(self, grids):
+        _, compact_grid = grids
+        grid_copy = copy.deepcopy(compact_grid)
+        grid_copy.add_piece(3, "R")
+        assert grid_copy.mask != compact_grid.mask
+        assert grid_copy.heights != compact_grid.heights
+
+    def test_set_cell(self):
+        grid = CompactGrid()
+        grid.set_cell(0, 2, "R")
+        grid.set_cell(0, 2, "B")
+        assert grid.get_bitboard("R") == 0
+        assert grid.column_height(2) == 1
+        grid.set_cell(0, 2, None)
+        assert grid.mask == 0
+        assert grid.num_pieces == 0
@@ -0,0 +1,42 @@
+import pytest
+from main_project.tournament import make_config, play_game, run_tournament, wilson_interval
+from main_project.strategy import shutdown_pools
+
+
+class TestTournament:
+    def test_make_config(self):
+        config = make_config(depth=2)
+        assert config["depth"] == 2
+        assert config["select_p"] == 1.0
+        with pytest.raises(ValueError):
+            make_config(difficulty=4)
+
+    def test_wilson_interval(self):
+        low, high = wilson_interval(5, 10)
+        assert low == pytest.approx(0.2366, abs=1e-4)
+        assert high == pytest.approx(0.7634, abs=1e-4)
+        assert wilson_interval(0, 10)[0] == 0.0
+        assert wilson_interval(10, 10)[1] == 1.0
+
+    def test_play_game(self):
+        # A player who only looks one move ahead loses to one who looks further
+        result = play_game(make_config(depth=6), make_config(depth=1, book=False), True, 0)
+        assert result["winner"] in ("A", None)
+        assert len(result["move_times"]["A"]) == (result["moves"] + 1) // 2
+        assert len(result["move_times"]["B"]) == result["moves"] // 2
+
+    def test_run_tournament(self):
+        config = make_config(depth=1, book=False, options={"cache_size": 1009})
+        try:
+            tournament = run_tournament(config, config, games=4, workers=2, rules=(4, 5, 3))
+
+        finally:
+            shutdown_pools()
+
+        summary = tournament["summary"]
+        assert summary["games"] == 4
+        assert summary["A_win_rate"][0] + summary["B_win_rate"][0] + summary["draw_rate"][0] == pytest.approx(1)
+        assert summary["games_per_second"] > 0
+        # The same seeds give the same games
+        assert [game["winner"] for game in tournament["games"]] == \
+            [game["winner"] for game in run_tournament(config, config, games=4, rules=(4, 5, 3))["games"]]
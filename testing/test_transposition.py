@@ -0,0 +1,212 @@
+import pytest
+from main_project.transposition import TranspositionTable, SharedTranspositionTable, EXACT, LOWER, UPPER, table_size
+from concurrent.futures import ProcessPoolExecutor
+import os
+import subprocess
+import sys
+
+
+class TestTranspositionTable:
+    @pytest.fixture()
+    def depth_table(self):
+        return TranspositionTable(4, "depth")
+
+    @pytest.fixture()
+    def always_table(self):
+        return TranspositionTable(4, "always")
+
+    def test_probe_does_not_store(self, depth_table):
+        assert depth_table.probe(1) is None
+        assert len(depth_table) == 0
+        assert depth_table.misses == 1
+
+    def test_store_and_probe(self, depth_table):
+        depth_table.store(1, 10, 3, LOWER, 2)
+        assert depth_table.probe(1) == (1, 10, 3, LOWER, 2, 0)
+        assert depth_table.hits == 1
+        assert len(depth_table) == 1
+
+    def test_collision(self, depth_table):
+        depth_table.store(1, 10, 3, EXACT, 2)
+        # 5 is stored in the same slot as 1
+        assert depth_table.probe(5) is None
+        assert depth_table.collisions == 1
+
+    def test_depth_preferred(self, depth_table):
+        depth_table.store(1, 10, 3, EXACT, 2)
+        assert not depth_table.store(5, 20, 2, UPPER, 0)
+        assert depth_table.probe(1)[1] == 10
+        assert depth_table.store(5, 20, 4, UPPER, 0)
+        assert depth_table.probe(5)[1] == 20
+        assert len(depth_table) == 1
+
+    def test_always_replace(self, always_table):
+        always_table.store(1, 10, 3, EXACT, 2)
+        assert always_table.store(5, 20, 2, UPPER, 0)
+        assert always_table.probe(1) is None
+        assert always_table.probe(5) == (5, 20, 2, UPPER, 0, 0)
+
+    def test_keeps_old_move(self, depth_table):
+        depth_table.store(1, 10, 3, EXACT, 2)
+        depth_table.store(1, 12, 4, EXACT)
+        assert depth_table.probe(1) == (1, 12, 4, EXACT, 2, 0)
+
+    def test_old_generation_replaced(self, depth_table):
+        depth_table.store(1, 10, 3, EXACT, 2)
+        depth_table.new_generation()
+        # The deeper entry is from an earlier search so it is replaced
+        assert depth_table.store(5, 20, 2, UPPER, 0)
+        assert depth_table.probe(5) == (5, 20, 2, UPPER, 0, 1)
+
+    def test_hit_refreshes_generation(self, depth_table):
+        depth_table.store(1, 10, 3, EXACT, 2)
+        depth_table.new_generation()
+        assert depth_table.probe(1) == (1, 10, 3, EXACT, 2, 1)
+        # The entry was used by this search so it is kept
+        assert not depth_table.store(5, 20, 2, UPPER, 0)
+
+    def test_invalid_policy(self):
+        with pytest.raises(ValueError):
+            TranspositionTable(4, "never")
+
+    def test_large_keys(self, depth_table):
+        depth_table.store(1, 10, 3, EXACT, 2)
+        # Keys of grids with more than 64 cells don't fit in the key array
+        depth_table.store(1 << 70, -10, 5, UPPER, 1)
+        assert depth_table.probe(1 << 70) == (1 << 70, -10, 5, UPPER, 1, 0)
+        assert depth_table.probe(1) == (1, 10, 3, EXACT, 2, 0)
+
+    def test_value_range(self, depth_table):
+        with pytest.raises(ValueError):
+            depth_table.store(1, 1 << 31, 3, EXACT)
+
+        assert len(depth_table) == 0
+
+    def test_memory_usage(self, depth_table):
+        empty = depth_table.memory_usage()
+        depth_table.store(1, 10, 3, EXACT, 2)
+        # Entries are packed into the arrays, so storing one doesn't use any more memory
+        assert depth_table.memory_usage() == empty
+        assert depth_table.bytes_per_entry() == empty
+
+    def test_table_size(self):
+        sizes = [table_size(depth) for depth in range(20)]
+        assert sizes == sorted(sizes)
+        assert sizes[0] > 1000
+        assert sizes[-1] == TranspositionTable().size
+
+
+# Searches with a worker pool started before the shared table, so the workers have their own resource trackers, and
+# then with a pool sharing the table's tracker
+PARALLEL_SEARCH_SCRIPT = """
+import multiprocessing
+import sys
+from main_project import strategy
+from main_project.connect4_grid import Grid
+if __name__ == "__main__":
+    multiprocessing.set_start_method(sys.argv[1])
+    evaluator = strategy.Evaluator(Grid(), "R", 3, workers=2)
+    evaluator.grid_to_int()
+    evaluator.calculate_move_values()
+    for workers in (2, 3):
+        cache = strategy.SharedTranspositionTable(1009)
+        evaluator = strategy.Evaluator(Grid(), "R", 3, workers=workers, cache=cache)
+        evaluator.grid_to_int()
+        evaluator.calculate_move_values()
+        cache.close()
+
+    strategy.shutdown_pools()
+"""
+
+
+def store_in_shared_table(table, key):
+    # Runs in another process, which opens the same shared memory
+    return table.store(key, -key, 7, UPPER, 3)
+
+
+class TestSharedTranspositionTable:
+    @pytest.fixture()
+    def shared_table(self):
+        table = SharedTranspositionTable(4, "depth")
+        yield table
+        table.close()
+
+    def test_store_and_probe(self, shared_table):
+        assert shared_table.probe(1) is None
+        shared_table.store(1, -2000001, 3, LOWER, 2)
+        assert shared_table.probe(1) == (1, -2000001, 3, LOWER, 2, 0)
+        assert len(shared_table) == 1
+
+    def test_same_policy_as_table(self, shared_table):
+        shared_table.store(1, 10, 3, EXACT, 2)
+        assert shared_table.probe(5) is None
+        assert shared_table.collisions == 1
+        assert not shared_table.store(5, 20, 2, UPPER)
+        shared_table.store(1, 12, 4, EXACT)
+        assert shared_table.probe(1) == (1, 12, 4, EXACT, 2, 0)
+
+    def test_generations(self, shared_table):
+        shared_table.store(1, 10, 3, EXACT, 2)
+        other = SharedTranspositionTable(name=shared_table.name)
+        # Only the process that made the table starts generations, the others follow it
+        other.new_generation()
+        assert shared_table.generation == other.generation == 0
+        shared_table.new_generation()
+        assert shared_table.generation == 1
+        assert other.generation == 0
+        other.new_generation()
+        assert other.generation == 1
+        opened = SharedTranspositionTable(name=shared_table.name)
+        assert opened.generation == 1
+        opened.close()
+        other.close()
+        assert shared_table.store(5, 20, 2, UPPER, 0)
+        assert shared_table.probe(5) == (5, 20, 2, UPPER, 0, 1)
+
+    def test_torn_entry_ignored(self, shared_table):
+        shared_table.store(1, 10, 3, EXACT, 2)
+        # Another process only finished writing half of a different entry
+        index = shared_table.index(1)
+        shared_table._words[index] = shared_table.pack(20, 4, EXACT, 0)
+        assert shared_table.probe(1) is None
+
+    def test_opened_by_name(self, shared_table):
+        other = SharedTranspositionTable(name=shared_table.name)
+        other.store(2, 5, 1, EXACT)
+        assert other.replacement == "depth"
+        other.close()
+        assert shared_table.probe(2) == (2, 5, 1, EXACT, None, 0)
+
+    def test_pack_range(self, shared_table):
+        # Deeper searches are stored as depth 255 rather than overwriting the bound
+        shared_table.store(1, 10, 300, EXACT, 2)
+        assert shared_table.probe(1) == (1, 10, 255, EXACT, 2, 0)
+        with pytest.raises(ValueError):
+            shared_table.pack(1 << 31, 3, EXACT)
+
+        with pytest.raises(ValueError):
+            shared_table.pack(0, 3, EXACT, 255)
+
+    def test_close_twice(self):
+        table = SharedTranspositionTable(4)
+        other = SharedTranspositionTable(name=table.name)
+        other.close()
+        other.close()
+        # Closing the other handle didn't free the memory
+        assert SharedTranspositionTable(name=table.name).size == 4
+        table.close()
+        table.close()
+
+    @pytest.mark.parametrize("start_method", ["fork", "spawn"])
+    def test_no_leak_warnings(self, start_method):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, "-c", PARALLEL_SEARCH_SCRIPT, start_method], cwd=root,
+                                capture_output=True, text=True, timeout=120)
+        assert result.returncode == 0
+        assert result.stderr == ""
+
+    def test_other_process(self, shared_table):
+        with ProcessPoolExecutor(1) as pool:
+            assert pool.submit(store_in_shared_table, shared_table, 3).result()
+
+        assert shared_table.probe(3) == (3, -3, 7, UPPER, 3, 0)